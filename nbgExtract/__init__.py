@@ -1,8 +1,16 @@
 __version__ = "0.0.1"
-# Set default logging handler to avoid "No handler found" warnings.
-import logging
-from logging import NullHandler
 
-logging.basicConfig()
-logger = logging.getLogger(__name__)
-logger.addHandler(NullHandler())
\ No newline at end of file
+
+def __getattr__(name: str):
+    """
+    create the package logger on first use so that importing the package has no side effects
+    and does not pay for importing logging (e.g. in generated test files)
+    """
+    if name == "logger":
+        import logging
+        logger = logging.getLogger(__name__)
+        # Set default logging handler to avoid "No handler found" warnings.
+        logger.addHandler(logging.NullHandler())
+        globals()["logger"] = logger
+        return logger
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
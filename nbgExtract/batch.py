@@ -0,0 +1,213 @@
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from . import logger
+from .gen.writer import GeneratedFileWriter
+from .notebook import GraderNotebook, Submissions
+
+# source notebooks already loaded by this (worker) process
+_source_notebooks: Dict[str, GraderNotebook] = {}
+
+
+def load_source_notebook(source: Union[str, Path]) -> GraderNotebook:
+    """
+    Get the source notebook for the given location - each source is loaded only once per process
+    Args:
+        source: location of the source notebook
+
+    Returns:
+        GraderNotebook
+    """
+    key = str(Path(source).expanduser().absolute())
+    source_notebook = _source_notebooks.get(key)
+    if source_notebook is None:
+        source_notebook = GraderNotebook(key)
+        _source_notebooks[key] = source_notebook
+    return source_notebook
+
+
+@dataclass
+class BatchJob:
+    """
+    a single assignment of a batch run
+    """
+    source: str
+    submissions: str
+    output_folder: str
+    template: Optional[str] = None
+    output_zip: Optional[str] = None
+    only_merge_answers: bool = False
+    with_cell_comments: bool = False
+    runtime: str = "import"
+    policy: str = "run_all"
+    max_errors: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, record: dict, base_dir: Optional[Path] = None) -> "BatchJob":
+        """
+        create a job from a manifest entry
+        Args:
+            record: manifest entry - "submission_zip" is accepted as alias for "submissions"
+            base_dir: directory relative paths of the entry are resolved against
+        """
+        record = dict(record)
+        if "submission_zip" in record:
+            record["submissions"] = record.pop("submission_zip")
+        if base_dir is not None:
+            for key in ["source", "submissions", "output_folder", "template", "output_zip"]:
+                value = record.get(key)
+                if value is not None:
+                    record[key] = str(base_dir.joinpath(Path(value).expanduser()))
+        return cls(**record)
+
+    @property
+    def size(self) -> int:
+        """
+        size of the submissions in bytes used to schedule the largest jobs first
+        """
+        path = Path(self.submissions).expanduser()
+        if path.is_dir():
+            return sum(file_path.stat().st_size for file_path in path.rglob("*") if file_path.is_file())
+        if path.is_file():
+            return path.stat().st_size
+        return 0
+
+
+@dataclass
+class BatchResult:
+    """
+    result of a batch job
+    """
+    job: BatchJob
+    submissions: int = 0
+    error: Optional[str] = None
+    duration: float = 0.0
+
+
+def run_batch_job(job: BatchJob, debug: bool = False) -> BatchResult:
+    """
+    generate the python files of the given job
+    Args:
+        job: job to run
+        debug: if True show debug info
+
+    Returns:
+        BatchResult
+    """
+    result = BatchResult(job=job)
+    start = time.perf_counter()
+    try:
+        submissions = Submissions.from_source(job.submissions, debug=debug)
+        submissions.source_notebook = load_source_notebook(job.source)
+        writer = GeneratedFileWriter(job.output_folder, zip_path=job.output_zip)
+        submissions.generate_python_files(
+                target_dir=job.output_folder,
+                template_filepath=job.template,
+                with_cell_comments=job.with_cell_comments,
+                only_merge_answers=job.only_merge_answers,
+                writer=writer,
+                runtime=job.runtime,
+                policy=job.policy,
+                max_errors=job.max_errors
+        )
+        result.submissions = len(submissions)
+    except Exception as ex:
+        result.error = f"{job.submissions}:{repr(ex)}"
+    result.duration = time.perf_counter() - start
+    return result
+
+
+@dataclass
+class BatchRunner:
+    """
+    runs multiple assignments over one shared worker pool
+    """
+    jobs: List[BatchJob] = field(default_factory=list)
+    max_workers: Optional[int] = None
+    debug: bool = False
+    status_file: Optional[str] = None
+
+    @classmethod
+    def from_manifest(cls, manifest_path: Union[str, Path], **kwargs) -> "BatchRunner":
+        """
+        create a batch runner from the given JSON or YAML manifest
+        the manifest is a list of jobs or a dict with a "jobs" list
+        Args:
+            manifest_path: location of the manifest
+            **kwargs: further arguments of the runner
+        """
+        path = Path(manifest_path).expanduser()
+        with open(path, encoding="utf8") as fp:
+            if path.suffix.lower() in [".yaml", ".yml"]:
+                try:
+                    import yaml
+                except ImportError:
+                    raise Exception("PyYAML is needed to read YAML manifests - use a JSON manifest or pip install pyyaml")
+                manifest = yaml.safe_load(fp)
+            else:
+                manifest = json.load(fp)
+        if isinstance(manifest, dict):
+            manifest = manifest.get("jobs", [])
+        jobs = [BatchJob.from_dict(record, base_dir=path.parent.absolute()) for record in manifest]
+        return cls(jobs=jobs, **kwargs)
+
+    def scheduled_jobs(self) -> List[BatchJob]:
+        """
+        Get the jobs in scheduling order - largest jobs first to keep all workers busy
+        """
+        return sorted(self.jobs, key=lambda job: job.size, reverse=True)
+
+    def run(self) -> List[BatchResult]:
+        """
+        run all jobs
+        if max_workers is 0 the jobs are run in this process
+
+        Returns:
+            list: results in scheduling order
+        """
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        from .progress import ProgressTracker
+        jobs = self.scheduled_jobs()
+        # progress is counted in submissions - their total is only known once a job is done
+        # and is extrapolated from the size of the remaining jobs
+        sizes = [job.size for job in jobs]
+        remaining_size = sum(sizes)
+        done_size = 0
+        progress = ProgressTracker(name="batch", status_file=self.status_file)
+
+        def job_done(result: BatchResult, size: int):
+            nonlocal remaining_size, done_size
+            remaining_size -= size
+            done_size += size
+            # a failed job counts as one failed submission
+            count = 1 if result.error is not None else result.submissions
+            done = progress.done + count
+            progress.total = done + (round(remaining_size * done / done_size) if done_size > 0 else 0)
+            progress.item_done(result.job.submissions, result.duration, failed=result.error is not None, count=count)
+
+        if self.max_workers == 0:
+            results = []
+            for job, size in zip(jobs, sizes):
+                result = run_batch_job(job, self.debug)
+                job_done(result, size)
+                results.append(result)
+        else:
+            max_workers = self.max_workers or min(len(jobs), os.cpu_count() or 1) or 1
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(run_batch_job, job, self.debug): i for i, job in enumerate(jobs)}
+                results = [None] * len(jobs)
+                for future in as_completed(futures):
+                    result = future.result()
+                    job_done(result, sizes[futures[future]])
+                    results[futures[future]] = result
+        progress.close()
+        for result in results:
+            if result.error:
+                logger.error(result.error)
+            else:
+                logger.info(f"Generated {result.submissions} submissions of {result.job.submissions}")
+        return results
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional
+
+from . import logger
+from .cells import Cell
+
+if TYPE_CHECKING:
+    from .notebook import GraderNotebook, Submission
+
+
+@dataclass
+class TamperedCell:
+    """
+    a locked or graded cell whose content does not match its nbgrader checksum
+    """
+    notebook: str
+    grade_id: str
+    expected: Optional[str]
+    actual: str
+
+
+def is_checked(nbgrader: dict) -> bool:
+    """
+    check if the cell with the given nbgrader metadata must not be changed by students
+    i.e. nbgraders is_locked - solution cells are never locked, grade cells always
+    """
+    if nbgrader.get("solution", False):
+        return False
+    return bool(nbgrader.get("grade", False) or nbgrader.get("locked", False))
+
+
+class ChecksumVerifier:
+    """
+    recomputes nbgrader compatible checksums of locked and graded cells
+    see nbgrader.utils.compute_checksum
+    """
+
+    def __init__(self, release_notebook: Optional[GraderNotebook] = None):
+        """
+        constructor
+        Args:
+            release_notebook: If set the expected checksums are taken from the released notebook
+                              (the source notebook still contains the hidden tests and can not be used)
+                              otherwise the checksums stored in the submission metadata are used
+        """
+        self._md5 = hashlib.md5()
+        self.expected_checksums: Dict[str, str] = {}
+        self.checked_cells = 0
+        self.tampered: Dict[str, List[TamperedCell]] = {}
+        if release_notebook is not None:
+            for cell in release_notebook.cells:
+                nbgrader = (cell.metadata or {}).get("nbgrader")
+                if nbgrader and is_checked(nbgrader):
+                    checksum = nbgrader.get("checksum") or self.compute_checksum(cell)
+                    self.expected_checksums[nbgrader["grade_id"]] = checksum
+
+    def compute_checksum(self, cell: Cell) -> str:
+        """
+        compute the nbgrader checksum of the given cell
+        Args:
+            cell: cell with nbgrader metadata
+
+        Returns:
+            str: md5 hexdigest
+        """
+        nbgrader = cell.metadata["nbgrader"]
+        grade = nbgrader.get("grade", False)
+        solution = nbgrader.get("solution", False)
+        source = cell.source if isinstance(cell.source, str) else "".join(cell.source or [])
+        m = self._md5.copy()
+        m.update(source.encode("utf-8"))
+        m.update(cell.cell_type.encode("utf-8"))
+        m.update(str(grade).encode("utf-8"))
+        m.update(str(solution).encode("utf-8"))
+        m.update(str(is_checked(nbgrader)).encode("utf-8"))
+        m.update(nbgrader["grade_id"].encode("utf-8"))
+        if grade:
+            m.update(str(float(nbgrader["points"])).encode("utf-8"))
+        return m.hexdigest()
+
+    def iter_tampered(self, notebook_name: str, cells: Iterable[Cell]) -> Iterator[TamperedCell]:
+        """
+        iterate over the tampered cells of the given cells
+        Args:
+            notebook_name: name of the notebook the cells belong to
+            cells: cells to check
+        """
+        for cell in cells:
+            nbgrader = (cell.metadata or {}).get("nbgrader")
+            if not nbgrader or not is_checked(nbgrader) or "grade_id" not in nbgrader:
+                continue
+            grade_id = nbgrader["grade_id"]
+            expected = self.expected_checksums.get(grade_id, nbgrader.get("checksum"))
+            if expected is None:
+                continue
+            self.checked_cells += 1
+            try:
+                actual = self.compute_checksum(cell)
+            except (KeyError, TypeError, ValueError) as ex:
+                # e.g. points removed from the metadata
+                actual = f"invalid metadata: {ex}"
+            if actual != expected:
+                yield TamperedCell(notebook=notebook_name, grade_id=grade_id, expected=expected, actual=actual)
+
+    def verify(self, submission: Submission) -> List[TamperedCell]:
+        """
+        verify the locked and graded cells of the given submission
+        Args:
+            submission: submission to verify
+
+        Returns:
+            list: tampered cells - empty if the submission is unchanged
+        """
+        name = str(submission.notebook_filepath)
+        tampered = list(self.iter_tampered(name, submission.cells))
+        if tampered:
+            self.tampered[name] = tampered
+            grade_ids = ", ".join(cell.grade_id for cell in tampered)
+            logger.warning(f"{name}: locked cells have been modified: {grade_ids}")
+        return tampered
+
+    def verify_all(self, submissions: Iterable[Submission]) -> Dict[str, List[TamperedCell]]:
+        """
+        verify all given submissions
+
+        Returns:
+            dict: notebook name → tampered cells of all tampered submissions
+        """
+        for submission in submissions:
+            self.verify(submission)
+        return self.tampered
@@ -0,0 +1,476 @@
+import contextlib
+import io
+import json
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, List, Optional, Sequence, Tuple, Union
+
+from . import logger
+
+if TYPE_CHECKING:
+    from .gen.context import NbgCellTestResult
+    from .gen.generator import NbgCodeGenerator
+    from .notebook import GraderNotebook
+    from .progress import ProgressTracker
+
+# a merged notebook or the location of a file generated by NbgCodeGenerator
+GradingItem = Union["GraderNotebook", str, Path]
+# length prefix of the messages of the worker protocol
+_MESSAGE_HEADER = struct.Struct(">I")
+
+
+def execute_code(code: str, file_name: str = "<nbg-generated>", show_output: bool = False) -> List["NbgCellTestResult"]:
+    """
+    run the given code generated by NbgCodeGenerator in this process
+    failing cells record 0 points instead of raising and no results.json is written
+    Args:
+        code: generated python code
+        file_name: file name of the code used in tracebacks and for the sibling runtime lookup
+        show_output: if True show the output of the cells
+
+    Returns:
+        list: test results of the autograded test cells
+    """
+    module = {"__name__": "__nbg_generated__", "__file__": file_name}
+    exec(compile(code, file_name, "exec"), module)
+    notebook = module["TestNbgraderNotebook"]()
+    notebook.setUp()
+    notebook.show_output = show_output
+    notebook.suppress_exception = True
+    notebook.results_file = None
+    output = contextlib.nullcontext() if show_output else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        notebook.test_cells()
+    return list(notebook.notebook_context.tests)
+
+
+def execute_task(task: Tuple[str, str], show_output: bool = False) -> List["NbgCellTestResult"]:
+    """
+    run the given (file_name, code) task - module level function to be usable in worker processes
+    """
+    file_name, code = task
+    return execute_code(code, file_name=file_name, show_output=show_output)
+
+
+def results_to_records(results: List["NbgCellTestResult"]) -> List[list]:
+    return [[result.grade_id, result.max_points, result.points] for result in results]
+
+
+def results_from_records(records: List[list]) -> List["NbgCellTestResult"]:
+    from .gen.context import NbgCellTestResult
+    return [NbgCellTestResult(grade_id, max_points, points) for grade_id, max_points, points in records]
+
+
+class GradingExecutor:
+    """
+    runs merged notebooks or generated files and returns the test results of their autograded cells
+    subclasses decide where the code is executed
+    """
+    # number of items executed at the same time
+    concurrency = 1
+
+    def __init__(self, generator: Optional["NbgCodeGenerator"] = None):
+        """
+        constructor
+        Args:
+            generator: generator for the code of notebook items. If None the default NbgCodeGenerator is used
+        """
+        self.generator = generator
+
+    def task(self, item: GradingItem) -> Tuple[str, str]:
+        """
+        Get the (file_name, code) task of the given item
+        Args:
+            item: merged notebook or location of a generated file
+        """
+        if isinstance(item, (str, Path)):
+            file_path = Path(item).expanduser()
+            return str(file_path.absolute()), file_path.read_text(encoding="utf8")
+        if self.generator is None:
+            from .gen.generator import NbgCodeGenerator
+            self.generator = NbgCodeGenerator()
+        return f"<{item.name}>", self.generator.generate(item)
+
+    def submit(self, item: GradingItem) -> "Future[List[NbgCellTestResult]]":
+        """
+        schedule the execution of the given item
+        Args:
+            item: merged notebook or location of a generated file
+
+        Returns:
+            Future: resolves to the test results of the item
+        """
+        return self.submit_task(self.task(item))
+
+    def submit_task(self, task: Tuple[str, str]) -> "Future[List[NbgCellTestResult]]":
+        """
+        schedule the execution of the given (file_name, code) task
+        """
+        raise NotImplementedError
+
+    def run(
+            self,
+            items: Iterable[GradingItem],
+            progress: Optional["ProgressTracker"] = None
+    ) -> List[Optional[List["NbgCellTestResult"]]]:
+        """
+        execute the given items
+        at most twice the concurrency of the executor is in flight so that the code of all items
+        is not generated up front and the item durations do not include long queue waits
+        Args:
+            items: merged notebooks or locations of generated files
+            progress: If set each completed item is reported with its duration and failure state
+
+        Returns:
+            list: test results per item in the order of the given items - None for items that failed
+        """
+        items = list(items)
+        results: List[Optional[List["NbgCellTestResult"]]] = [None] * len(items)
+        if progress is not None and progress.total is None:
+            progress.total = len(items)
+        pending = {}
+        remaining = iter(enumerate(items))
+
+        def submit_next():
+            for index, item in remaining:
+                start = time.perf_counter()
+                try:
+                    if progress is not None:
+                        with progress.stage("generate"):
+                            task = self.task(item)
+                    else:
+                        task = self.task(item)
+                    pending[self.submit_task(task)] = (index, item, start)
+                    return
+                except Exception as ex:
+                    logger.error(f"{self.item_name(item)}:{repr(ex)}")
+                    if progress is not None:
+                        progress.item_done(self.item_name(item), time.perf_counter() - start, failed=True)
+
+        for _ in range(2 * self.concurrency):
+            submit_next()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, item, start = pending.pop(future)
+                failed = False
+                try:
+                    results[index] = future.result()
+                except Exception as ex:
+                    logger.error(repr(ex))
+                    failed = True
+                if progress is not None:
+                    progress.item_done(self.item_name(item), time.perf_counter() - start, failed=failed)
+                submit_next()
+        if progress is not None:
+            progress.close()
+        return results
+
+    @staticmethod
+    def item_name(item: GradingItem) -> str:
+        """
+        Get the name of the given item used in progress reports and errors
+        """
+        if isinstance(item, (str, Path)):
+            return str(item)
+        return str(getattr(item, "notebook_filepath", None) or item.name)
+
+    def close(self):
+        """
+        release the resources of the executor
+        """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class InProcessExecutor(GradingExecutor):
+    """
+    executes the items one after another in this process
+    the items are not isolated - use ProcessPoolGradingExecutor for untrusted submissions
+    """
+
+    def __init__(self, generator: Optional["NbgCodeGenerator"] = None, show_output: bool = False):
+        """
+        constructor
+        Args:
+            generator: generator for the code of notebook items
+            show_output: if True show the output of the cells
+        """
+        super().__init__(generator)
+        self.show_output = show_output
+
+    def submit_task(self, task: Tuple[str, str]) -> "Future[List[NbgCellTestResult]]":
+        future = Future()
+        try:
+            future.set_result(execute_task(task, show_output=self.show_output))
+        except Exception as ex:
+            future.set_exception(ex)
+        return future
+
+
+def _execute_in_child(task: Tuple[str, str], sender):
+    """
+    run the given task in a grading process and send ("results", records) or ("error", message) to the parent
+    """
+    try:
+        message = ("results", results_to_records(execute_task(task)))
+    except BaseException as ex:
+        message = ("error", repr(ex))
+    sender.send(message)
+    sender.close()
+
+
+class ProcessPoolGradingExecutor(GradingExecutor):
+    """
+    executes each item in a fresh local process - at most max_workers processes run at the same time
+    a submission can therefore neither leak state (modules, patched builtins) into the next submission
+    nor affect other items by crashing or hanging - such items fail and the remaining items are graded
+    """
+
+    def __init__(
+            self,
+            generator: Optional["NbgCodeGenerator"] = None,
+            max_workers: Optional[int] = None,
+            timeout: Optional[float] = 60
+    ):
+        """
+        constructor
+        Args:
+            generator: generator for the code of notebook items
+            max_workers: number of concurrent grading processes. If None the number of CPUs is used
+            timeout: seconds after which the grading process of an item is killed - None: no timeout
+        """
+        super().__init__(generator)
+        import multiprocessing
+        import os
+        self.timeout = timeout
+        # forkserver children are forked from a clean single threaded server process
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self._context = multiprocessing.get_context(start_method)
+        self.concurrency = max_workers or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+    def execute_isolated(self, task: Tuple[str, str]) -> List["NbgCellTestResult"]:
+        """
+        run the given task in a fresh process and wait for its results
+        """
+        file_name = task[0]
+        receiver, sender = self._context.Pipe(duplex=False)
+        process = self._context.Process(target=_execute_in_child, args=(task, sender), daemon=True)
+        process.start()
+        sender.close()
+        try:
+            if not receiver.poll(self.timeout):
+                raise TimeoutError(f"{file_name}: grading timed out after {self.timeout}s")
+            try:
+                status, value = receiver.recv()
+            except EOFError:
+                process.join()
+                raise ChildProcessError(f"{file_name}: grading process exited with code {process.exitcode}")
+        finally:
+            if process.is_alive():
+                process.kill()
+            process.join()
+            receiver.close()
+        if status == "error":
+            raise Exception(f"{file_name}: {value}")
+        return results_from_records(value)
+
+    def submit_task(self, task: Tuple[str, str]) -> "Future[List[NbgCellTestResult]]":
+        return self._executor.submit(self.execute_isolated, task)
+
+    def close(self):
+        self._executor.shutdown()
+
+
+def send_message(connection: socket.socket, message: dict):
+    """
+    send the given message as length prefixed JSON
+    """
+    data = json.dumps(message).encode("utf8")
+    connection.sendall(_MESSAGE_HEADER.pack(len(data)) + data)
+
+
+def receive_message(connection: socket.socket) -> Optional[dict]:
+    """
+    receive a length prefixed JSON message
+
+    Returns:
+        dict: the message
+        None: if the connection was closed
+    """
+    header = _receive_exactly(connection, _MESSAGE_HEADER.size)
+    if header is None:
+        return None
+    data = _receive_exactly(connection, _MESSAGE_HEADER.unpack(header)[0])
+    if data is None:
+        raise ConnectionError("connection closed in the middle of a message")
+    return json.loads(data.decode("utf8"))
+
+
+def _receive_exactly(connection: socket.socket, size: int) -> Optional[bytes]:
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = connection.recv(min(remaining, 1 << 16))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+class SocketExecutor(GradingExecutor):
+    """
+    executes the items on grading workers reachable over TCP - see GradingWorker
+    each worker address is used for one request at a time and the idle addresses are kept in a queue
+    so that faster workers get more items
+    Protocol: a request {"file_name": ..., "code": ...} is answered with {"results": [[grade_id, max_points, points], ...]}
+    or {"error": ...} - each message is JSON prefixed with its length as 4 byte big endian integer
+    """
+
+    def __init__(
+            self,
+            addresses: Sequence[Tuple[str, int]],
+            generator: Optional["NbgCodeGenerator"] = None,
+            slots: int = 1,
+            timeout: Optional[float] = None
+    ):
+        """
+        constructor
+        Args:
+            addresses: (host, port) of the workers
+            generator: generator for the code of notebook items
+            slots: number of concurrent requests per worker e.g. the number of processes of the worker
+            timeout: timeout in seconds for a single request
+        """
+        super().__init__(generator)
+        if not addresses:
+            raise ValueError("at least one worker address is needed")
+        self.timeout = timeout
+        self._addresses = queue.Queue()
+        for _ in range(slots):
+            for address in addresses:
+                self._addresses.put(tuple(address))
+        self.concurrency = self._addresses.qsize()
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+    def request(self, task: Tuple[str, str]) -> List["NbgCellTestResult"]:
+        """
+        send the given task to the next idle worker and wait for its results
+        """
+        file_name, code = task
+        address = self._addresses.get()
+        try:
+            with socket.create_connection(address, timeout=self.timeout) as connection:
+                send_message(connection, {"file_name": file_name, "code": code})
+                response = receive_message(connection)
+        finally:
+            self._addresses.put(address)
+        if response is None:
+            raise ConnectionError(f"worker {address[0]}:{address[1]} closed the connection")
+        if "error" in response:
+            raise Exception(f"worker {address[0]}:{address[1]}: {response['error']}")
+        return results_from_records(response["results"])
+
+    def submit_task(self, task: Tuple[str, str]) -> "Future[List[NbgCellTestResult]]":
+        return self._executor.submit(self.request, task)
+
+    def close(self):
+        self._executor.shutdown()
+
+
+class GradingWorker(socketserver.ThreadingTCPServer):
+    """
+    grading worker daemon that answers the requests of SocketExecutor
+    a local worker stands in for a remote node - the protocol is the same
+    Note: the worker executes the code it receives - only bind it to trusted networks
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, executor: Optional[GradingExecutor] = None):
+        """
+        constructor
+        Args:
+            host: interface to listen on
+            port: port to listen on - 0 to pick a free port
+            executor: executor that runs the received code. If None a ProcessPoolGradingExecutor is used
+                requests are handled concurrently - the InProcessExecutor is only suited for a single client
+        """
+        self.executor = executor if executor is not None else ProcessPoolGradingExecutor()
+        super().__init__((host, port), _GradingRequestHandler)
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.server_address[0], self.server_address[1]
+
+    def execute(self, request: dict) -> dict:
+        """
+        execute the given request and Get the response
+        """
+        try:
+            task = (request.get("file_name", "<nbg-generated>"), request["code"])
+            return {"results": results_to_records(self.executor.submit_task(task).result())}
+        except Exception as ex:
+            logger.error(f"{request.get('file_name')}:{repr(ex)}")
+            return {"error": repr(ex)}
+
+    def start(self) -> threading.Thread:
+        """
+        serve in a background thread e.g. to stand in for a remote worker in tests or on a single machine
+        """
+        thread = threading.Thread(target=self.serve_forever, name=f"grading-worker-{self.address[1]}", daemon=True)
+        thread.start()
+        return thread
+
+    def server_close(self):
+        super().server_close()
+        self.executor.close()
+
+
+class _GradingRequestHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        while True:
+            request = receive_message(self.request)
+            if request is None:
+                return
+            send_message(self.request, self.server.execute(request))
+
+
+def main(argv=None):
+    """
+    run a grading worker daemon
+    """
+    import argparse
+    import logging
+    parser = argparse.ArgumentParser(description="worker daemon that grades the generated files sent by a SocketExecutor")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="interface to listen on - the worker executes the received code, only use trusted networks")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on")
+    parser.add_argument("--workers", type=int, help="number of grading processes - default: number of CPUs")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds after which the grading of a submission is killed")
+    parser.add_argument("-d", "--debug", action="store_true", help="show debug info")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO)
+    with GradingWorker(args.host, args.port, ProcessPoolGradingExecutor(max_workers=args.workers, timeout=args.timeout)) as worker:
+        logger.info(f"grading worker listening on {worker.address[0]}:{worker.address[1]}")
+        try:
+            worker.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
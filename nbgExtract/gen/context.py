@@ -1,14 +1,20 @@
 import io
-import json
-import logging
-from contextlib import redirect_stdout
-from dataclasses import dataclass
-from pathlib import Path
-from typing import List, Optional
+import sys
 
-from nbgExtract.cells import Cell, NbgraderCellType
+# this module is imported by every generated test file and must therefore
+# only import lightweight builtin modules - typing, dataclasses and contextlib are avoided
+# it is also inlined into generated files (see NbgCodeGenerator runtime "inline")
+# so it must not use __future__ imports and annotations are quoted
 
-logger = logging.getLogger(__name__)
+
+def is_autograded_test(nbgrader: "dict | None") -> bool:
+    """
+    check if the given nbgrader cell metadata belongs to an autograded test cell
+    see NbgraderCellMetadata.get_type
+    """
+    if not nbgrader:
+        return False
+    return bool(nbgrader.get("grade")) and not nbgrader.get("solution") and not nbgrader.get("task")
 
 
 class NotebookContext:
@@ -16,64 +22,198 @@ class NotebookContext:
     jupyter notebook cell context to execute cell code and
     keep control over output, exceptions and received points in case of nbgrader test cells
     """
+    RUN_ALL = "run_all"
+    SKIP_DEPENDENTS = "skip_dependents"
+    POLICIES = [RUN_ALL, SKIP_DEPENDENTS]
 
-    def __init__(self, name: str, show_output: bool = True, suppress_exception: bool = False):
+    def __init__(
+            self,
+            name: str,
+            show_output: bool = True,
+            suppress_exception: bool = False,
+            capture_output: bool = True,
+            policy: str = RUN_ALL,
+            max_errors: "int | None" = None
+    ):
         """
         constructor
         Args:
             name: name of the notebook
             show_output: If True show output of cells otherwise cell output is not shown
             suppress_exception: If False when a cell raises an exception the execution of the other cells is not influenced
+            capture_output: If False the cell output is not captured and goes directly to stdout
+            policy: execution policy for failing cells (implies suppressed exceptions unless run_all)
+                run_all: run every cell
+                skip_dependents: skip cells that read names defined by a failed or skipped cell
+                                 before assigning them - a name is cleared once a later cell redefines it
+            max_errors: If set skip all remaining cells after the given number of cells raising an exception
+                        (implies suppressed exceptions) - failing assertions are not counted
+                        so that failed tests do not cost the points of the remaining tests
         """
+        if policy not in self.POLICIES:
+            raise ValueError(f"unknown policy {policy} - use one of {self.POLICIES}")
         self.name = name
         self.show_output = show_output
-        self.suppress_exception = suppress_exception
+        self.suppress_exception = suppress_exception or policy != self.RUN_ALL or max_errors is not None
+        self.capture_output = capture_output
+        self.policy = policy
+        self.max_errors = max_errors
         self.cell_output = io.StringIO()
-        self.output_catcher = redirect_stdout(self.cell_output)
+        self._stdout = None
         self._current_cell = None
-        self.tests: List[NbgCellTestResult] = []
+        self._current_score = None
+        self._current_defines = ()
+        self._current_uses = ()
+        self._skip_current = False
+        self.failed_names = set()
+        self.errors: "list[str]" = []
+        self.failed_asserts: "list[str]" = []
+        self.skipped = 0
+        self.tests: "list[NbgCellTestResult]" = []
+
+    def __enter__(self) -> bool:
+        """
+        start executing the current cell
+
+        Returns:
+            bool: False if the cell is to be skipped according to the execution policy
+        """
+        self._current_score = None
+        self._skip_current = self._should_skip()
+        if self._skip_current:
+            return False
+        if self.capture_output:
+            self._reset_cell_output()
+            self._stdout = sys.stdout
+            sys.stdout = self.cell_output
+        return True
+
+    def _should_skip(self) -> bool:
+        """
+        check the execution policy for the current cell
+        """
+        if self.max_errors is not None and len(self.errors) >= self.max_errors:
+            return True
+        if self.policy == self.SKIP_DEPENDENTS and self.failed_names:
+            return not self.failed_names.isdisjoint(self._current_uses)
+        return False
+
+    def _record_failure(self, points: "float | None", mark_names: bool = True):
+        """
+        record the given points if the current cell is an autograded test
+        Args:
+            points: points of the cell
+            mark_names: If True mark the names defined by the current cell as failed
+        """
+        if mark_names:
+            self.failed_names.update(self._current_defines)
+        nbgrader = self._current_nbgrader()
+        if is_autograded_test(nbgrader):
+            self.tests.append(NbgCellTestResult(
+                    grade_id=nbgrader.get("grade_id"),
+                    max_points=nbgrader.get("points"),
+                    points=points
+            ))
 
-    def __enter__(self):
-        self._reset_cell_output()
-        self.output_catcher.__enter__()
+    def _current_nbgrader(self) -> "dict | None":
+        if self._current_cell is None:
+            return None
+        return (self._current_cell.get("metadata") or {}).get("nbgrader")
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.output_catcher.__exit__(exc_type, exc_val, exc_tb)
-        cell_output = self.cell_output.getvalue()
-        self._reset_cell_output()
-        if self.show_output:
-            print(cell_output)
+        if self._skip_current:
+            self.skipped += 1
+            self._record_failure(0.0)
+            self._current_cell = None
+            return False
+        cell_output = None
+        if self.capture_output:
+            sys.stdout = self._stdout
+            cell_output = self.cell_output.getvalue()
+            self._reset_cell_output()
+            if self.show_output:
+                print(cell_output)
         if exc_val:
             if self.suppress_exception:
+                cell_id = self._current_cell.get("id") if self._current_cell else None
+                failed_assert = issubclass(exc_type, AssertionError)
+                if failed_assert:
+                    self.failed_asserts.append(f"{cell_id}: {exc_type.__name__}: {exc_val}")
+                else:
+                    self.errors.append(f"{cell_id}: {exc_type.__name__}: {exc_val}")
+                # the assignments of a test cell with a failing assertion did run
+                test_cell = is_autograded_test(self._current_nbgrader())
+                self._record_failure(0.0, mark_names=not (failed_assert and test_cell))
+                self._current_cell = None
                 return True
             else:
                 raise exc_val
-        if isinstance(self._current_cell, Cell):
-            nbg_metadata = self._current_cell.get_nbg_metadata()
-            nbg_cell_type = nbg_metadata.get_type()
-            if nbg_cell_type is NbgraderCellType.AUTOGRADED_TESTS:
-                score = self.score_from_output(cell_output)
+        self.failed_names.difference_update(self._current_defines)
+        if self._current_cell is not None:
+            nbgrader = self._current_nbgrader()
+            if is_autograded_test(nbgrader):
+                score = self._current_score
+                if score is None and cell_output is not None:
+                    # code generated without record_score prints the score as last output
+                    score = self.score_from_output(cell_output)
                 cell_res = NbgCellTestResult(
-                        grade_id=nbg_metadata.grade_id,
-                        max_points=nbg_metadata.points,
+                        grade_id=nbgrader.get("grade_id"),
+                        max_points=nbgrader.get("points"),
                         points=score
                 )
                 self.tests.append(cell_res)
         self._current_cell = None
 
-    def __call__(self, cell_metadata: Optional[dict] = None):
-        try:
-            self._current_cell = Cell(**cell_metadata)
-        except:
-            logger.error(f"Cell metadata could not be converted to cell object: {cell_metadata}")
-            pass
+    def __call__(
+            self,
+            cell_metadata: "dict | None" = None,
+            defines: "tuple | list" = (),
+            uses: "tuple | list" = ()
+    ):
+        """
+        set the cell record of the next cell to execute
+        Args:
+            cell_metadata: cell record without source and outputs - None for cells without nbgrader metadata
+            defines: names assigned by the cell
+            uses: names read by the cell
+        """
+        self._current_cell = cell_metadata
+        self._current_defines = defines
+        self._current_uses = uses
         return self
 
     def _reset_cell_output(self):
         self.cell_output.truncate(0)
         self.cell_output.seek(0)
 
-    def score_from_output(self, output: str) -> Optional[float]:
+    def record_score(self, score) -> "float | None":
+        """
+        Record the received points of the current cell as nbgrader does
+        i.e. numeric values are partial credit capped at the points of the cell,
+        any other value (e.g. None or True) receives the full points of the cell
+        Args:
+            score: value of the last expression of an autograded test cell
+
+        Returns:
+            float: the recorded score
+            None: if the given value is not a number and the cell has no points
+        """
+        nbgrader = self._current_nbgrader() or {}
+        max_points = nbgrader.get("points")
+        max_points = None if max_points is None else float(max_points)
+        try:
+            if isinstance(score, (bool, str)):
+                # nbgrader parses the text representation of the output - True or 'text' are no numbers
+                raise ValueError(score)
+            points = float(score)
+        except (TypeError, ValueError):
+            points = max_points
+        if points is not None and max_points is not None:
+            points = min(points, max_points)
+        self._current_score = points
+        return self._current_score
+
+    def score_from_output(self, output: str) -> "float | None":
         """
         Get received points from output
         Assumption: score is printed as last expression as usual in nbgrader notebook
@@ -98,12 +238,13 @@ class NotebookContext:
         }
         return record
 
-    def store_notebook_result(self, target: Path):
+    def store_notebook_result(self, target: "str | Path"):
         """
         Store the notebook result by appending the record to the given target
         Args:
             target: location to store the record
         """
+        import json
         res = self.generate_notebook_result()
         with open(target, mode="a") as fp:
             json_str = json.dumps(res)
@@ -111,11 +252,21 @@ class NotebookContext:
             fp.write("\n")
 
 
-@dataclass
 class NbgCellTestResult:
     """
     Holds nbgrader cell test result
     """
-    grade_id: str
-    max_points: float
-    points: float
\ No newline at end of file
+    __slots__ = ("grade_id", "max_points", "points")
+
+    def __init__(self, grade_id: str, max_points: float, points: float):
+        self.grade_id = grade_id
+        self.max_points = max_points
+        self.points = points
+
+    def __repr__(self):
+        return f"NbgCellTestResult(grade_id={self.grade_id!r}, max_points={self.max_points!r}, points={self.points!r})"
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.grade_id, self.max_points, self.points) == (other.grade_id, other.max_points, other.points)
\ No newline at end of file
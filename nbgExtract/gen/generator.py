@@ -2,44 +2,135 @@ from __future__ import annotations
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
+    from nbgExtract.gen.writer import GeneratedFileWriter
     from nbgExtract.notebook import GraderNotebook
 import ast
 import logging
+import re
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, NamedTuple, Optional, Sequence, Tuple, Union
 from textwrap import indent
 from nbgExtract.cells import Cell, NbgraderCellMetadata, NbgraderCellType
 
 
 logger = logging.getLogger(__name__)
+# line breaks as seen by the python tokenizer - str.splitlines also splits at e.g. \x0c and \u2028
+_LINE_BREAK = re.compile(r"(?<=\n)|(?<=\r)(?!\n)")
 
 
 class NbgCodeGenerator:
     """
     Generate python code from nbgrader notebook with cell context control
     """
+    RUNTIMES = ["import", "inline", "sibling"]
+    RUNTIME_MODULE = "nbg_runtime"
 
-    def __init__(self):
-        pass
+    def __init__(
+            self,
+            runtime: str = "import",
+            policy: str = "run_all",
+            max_errors: Optional[int] = None,
+            cell_workers: int = 0,
+            parallel_threshold: int = 100000,
+            collect_tokens: bool = False
+    ):
+        """
+        constructor
+        Args:
+            runtime: how the generated files get the NotebookContext
+                import: import it from the installed nbgExtract package
+                inline: copy the dependency free runtime into each generated file
+                sibling: write the runtime once as nbg_runtime.py into the target directory
+            policy: default execution policy of the generated files - see NotebookContext
+            max_errors: default maximum number of failing cells of the generated files - see NotebookContext
+            cell_workers: If > 0 the cells of large notebooks are preprocessed in a pool of worker processes
+            parallel_threshold: minimum number of source characters of a notebook to use the worker pool
+            collect_tokens: If True also collect the normalized AST tokens of the cells in the same parse
+                            e.g. when a SimilarityIndex is filled while generating
+        """
+        if runtime not in self.RUNTIMES:
+            raise ValueError(f"unknown runtime {runtime} - use one of {self.RUNTIMES}")
+        self.runtime = runtime
+        self.policy = policy
+        self.max_errors = max_errors
+        self.cell_workers = cell_workers
+        self.parallel_threshold = parallel_threshold
+        self.collect_tokens = collect_tokens
+        self._executor = None
+        self._runtime_targets = set()
+
+    @property
+    def collect_names(self) -> bool:
+        """
+        the names defined and used by the cells are only needed by the skip_dependents policy
+        """
+        return self.policy == "skip_dependents"
+
+    def __enter__(self) -> "NbgCodeGenerator":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
-    def generate_file(self, notebook: GraderNotebook, target: Path):
+    def close(self):
+        """
+        shut down the cell preprocessing worker pool
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    @classmethod
+    def runtime_source(cls) -> str:
+        """
+        Get the sourcecode of the minimal NotebookContext runtime
+        """
+        runtime_path = Path(__file__).parent.joinpath("context.py")
+        return runtime_path.read_text(encoding="utf8")
+
+    def generate_file(self, notebook: GraderNotebook, target: Path, writer: Optional[GeneratedFileWriter] = None):
         """
         Extract code and generate python  file at given target
         Args:
             notebook: notebook to extract code from
             target: target dir location to store the file
+            writer: If set the file is queued to the given background writer instead of being written directly
         """
         code = self.generate(notebook)
-        file_name = notebook.name
-        file_name = "".join(x if x.isalnum() or x in ["/"] else "_" for x in file_name)
-        file_path = target.joinpath(f"test_{file_name}.py")
+        relative_path = self.get_file_name(notebook)
+        if self.runtime == "sibling" and target not in self._runtime_targets:
+            self._runtime_targets.add(target)
+            runtime_file_name = f"{self.RUNTIME_MODULE}.py"
+            if writer is not None:
+                writer.write(runtime_file_name, self.runtime_source())
+            else:
+                target.mkdir(parents=True, exist_ok=True)
+                target.joinpath(runtime_file_name).write_text(self.runtime_source(), encoding="utf8")
+        if writer is not None:
+            writer.write(relative_path, code)
+            return
+        file_path = target.joinpath(relative_path)
         file_path.parent.mkdir(parents=True, exist_ok=True)
         with open(file_path, mode="w") as fp:
             fp.write(code)
 
+    def get_file_name(self, notebook: GraderNotebook) -> str:
+        """
+        Get the relative file path of the python file generated for the given notebook
+        Args:
+            notebook: notebook to generate the file for
+
+        Returns:
+            str: relative file path
+        """
+        file_name = notebook.name
+        file_name = "".join(x if x.isalnum() or x in ["/"] else "_" for x in file_name)
+        return f"test_{file_name}.py"
+
     def generate(self, notebook: GraderNotebook) -> str:
         code = ""
-        code += self._imports()
+        code += self._imports(notebook)
         code += self._header()
         code += f'''
 class TestNbgraderNotebook(unittest.TestCase):
@@ -49,63 +140,70 @@ class TestNbgraderNotebook(unittest.TestCase):
 
     def setUp(self) -> None:
         self.show_output = True
+        self.capture_output = True
         self.suppress_exception = False
+        self.policy = "{self.policy}"
+        self.max_errors = {self.max_errors}
+        self.results_file = "results.json"
 
     def test_cells(self):
         notebook_context = NotebookContext(
                 name="{notebook.name}",
                 show_output=self.show_output, 
-                suppress_exception=self.suppress_exception
+                suppress_exception=self.suppress_exception,
+                capture_output=self.capture_output,
+                policy=self.policy,
+                max_errors=self.max_errors
         )
 '''
+        cells = [cell for cell in notebook.cells if cell.cell_type != "markdown"]
         notebook_imports = []
-        for cell in notebook.cells:
-            if cell.cell_type == "markdown":
-                continue
-            nbg_metadata = cell.get_nbg_metadata()
-            if nbg_metadata:
-                nbg_cell_type = nbg_metadata.get_type()
+        for cell, preprocessed in zip(cells, self.preprocess_cells(cells)):
+            notebook_imports.extend(preprocessed.imports)
+            sourcecode = preprocessed.sourcecode + "\npass"  # to avoid issues with empty cells
+            cell_record = self.get_cell_record(cell)
+            if self.collect_names:
+                defines, uses = preprocessed.defines, preprocessed.uses
+                cell_context = f"with notebook_context(cell_metadata={cell_record}, defines={defines}, uses={uses}) as run_cell:\n"
             else:
-                nbg_cell_type = None
-            cell_source = self.get_cell_sourcecode(cell)
-            sourcecode, cell_imports = self.separate_imports(cell_source)
-            notebook_imports.extend(cell_imports)
-            if nbg_cell_type is NbgraderCellType.AUTOGRADED_TESTS:
-                sourcecode = self.add_score_printout(sourcecode, nbg_metadata)
-            sourcecode += "\npass"  # to avoid issues with empty cells
-            # ToDo: simplify this part
-            if nbg_cell_type in [NbgraderCellType.AUTOGRADED_ANSWER, NbgraderCellType.AUTOGRADED_TESTS, NbgraderCellType.READ_ONLY]:
-                cell_record = cell.__dict__
-                for key in ["source", "outputs"]:
-                    if key in cell_record:
-                        cell_record.pop(key)
-                if "nbgrader" in cell_record.get("metadata"):
-                    if "notebook" in cell_record.get("metadata").get("nbgrader"):
-                        cell_record.get("metadata").get("nbgrader").pop("notebook")
-            else:
-                cell_record = None
-            cell_context = f"with notebook_context(cell_metadata={cell_record}):\n"
-            cell_context += indent(sourcecode, " "*4)
+                cell_context = f"with notebook_context(cell_metadata={cell_record}) as run_cell:\n"
+            cell_context += "    if run_cell:\n"
+            cell_context += indent(sourcecode, " "*8)
             code += indent(cell_context, " "*8)
             code += "\n"
         nbg_res_handling = """
+self.notebook_context = notebook_context
 print(notebook_context.tests)
-notebook_context.store_notebook_result(Path("results.json"))
+if self.results_file:
+    notebook_context.store_notebook_result(self.results_file)
 """
         code += indent(nbg_res_handling, " "*8)
-        additional_imports = "\n".join(notebook_imports)
+        additional_imports = "\n".join(self.hoist_imports(notebook_imports))
         code = f"{additional_imports}\n{code}\n"
         code += self.cmdline_tool()
         return code
 
-    def _imports(self):
-        return """
+    def _imports(self, notebook: GraderNotebook) -> str:
+        """
+        imports of the generated file including the NotebookContext runtime
+        """
+        imports = """
 import sys
-import argparse
 import unittest
-from pathlib import Path
-from nbgExtract.gen.context import NotebookContext
 """
+        if self.runtime == "inline":
+            imports += f"\n# NotebookContext runtime\n{self.runtime_source()}\n"
+        elif self.runtime == "sibling":
+            # the runtime is located in the target directory - the generated file might be in a subdirectory
+            depth = len(Path(self.get_file_name(notebook)).parts) - 1
+            runtime_dir = "".join([".parent"] * depth)
+            imports += f"""from pathlib import Path
+sys.path.insert(0, str(Path(__file__).absolute().parent{runtime_dir}))
+from {self.RUNTIME_MODULE} import NotebookContext
+"""
+        else:
+            imports += "from nbgExtract.gen.context import NotebookContext\n"
+        return imports
 
     def _header(self) -> str:
         """
@@ -134,55 +232,115 @@ def display(text: str):
         Returns:
 
         """
-        code = ""
-        if cell.source:
-            for line in cell.source:
-                if line.startswith("%"):
-                    line = f"#{line}"
-                if line.strip().startswith("!"):
-                    line = f"#{line}"
-                code += line
-        return code
+        return _cell_sourcecode(cell.source)
+
+    def get_cell_record(self, cell: Cell) -> Optional[dict]:
+        """
+        Get the cell record passed to the notebook context - the cell itself is not modified
+        Args:
+            cell: notebook cell
+
+        Returns:
+            dict: cell fields without source and outputs for nbgrader answer, test and read-only cells
+            None: for other cells
+        """
+        nbg_metadata = cell.get_nbg_metadata()
+        nbg_cell_type = nbg_metadata.get_type() if nbg_metadata else None
+        if nbg_cell_type not in [NbgraderCellType.AUTOGRADED_ANSWER, NbgraderCellType.AUTOGRADED_TESTS, NbgraderCellType.READ_ONLY]:
+            return None
+        cell_record = {key: value for key, value in cell.__dict__.items() if key not in ["source", "outputs"]}
+        metadata = dict(cell_record.get("metadata") or {})
+        if "notebook" in metadata.get("nbgrader", {}):
+            metadata["nbgrader"] = {key: value for key, value in metadata["nbgrader"].items() if key != "notebook"}
+        cell_record["metadata"] = metadata
+        return cell_record
+
+    def preprocess_cells(self, cells: List[Cell]) -> List[PreprocessedCell]:
+        """
+        preprocess the given cells - each cell is parsed only once
+        large notebooks are preprocessed in the worker pool if cell_workers is set
+        Args:
+            cells: code cells of the notebook
+
+        Returns:
+            list: preprocessed cells in the order of the given cells
+        """
+        tasks = []
+        for cell in cells:
+            nbg_metadata = cell.get_nbg_metadata()
+            points = None
+            if nbg_metadata and nbg_metadata.get_type() is NbgraderCellType.AUTOGRADED_TESTS:
+                points = str(nbg_metadata.points)
+            source = cell.source if isinstance(cell.source, str) else tuple(cell.source or ())
+            tasks.append((source, points, self.collect_tokens, self.collect_names))
+        source_size = sum(len(line) for source, *_ in tasks for line in source)
+        if self.cell_workers > 0 and len(tasks) > 1 and source_size >= self.parallel_threshold:
+            if self._executor is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # the writer threads are already running - forking would copy their locks
+                # forkserver workers are forked from a clean single threaded server process
+                start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._executor = ProcessPoolExecutor(
+                        max_workers=self.cell_workers,
+                        mp_context=multiprocessing.get_context(start_method)
+                )
+            chunksize = max(1, len(tasks) // (self.cell_workers * 4))
+            return list(self._executor.map(_preprocess_task, tasks, chunksize=chunksize))
+        return [_preprocess_task(task) for task in tasks]
+
+    def preprocess_cell(
+            self,
+            sourcecode: str,
+            metadata: Optional[NbgraderCellMetadata] = None,
+            tokens: Optional[bool] = None,
+            names: Optional[bool] = None
+    ) -> PreprocessedCell:
+        """
+        preprocess the given cell sourcecode as done by generate - see _preprocess_cell
+        Args:
+            sourcecode: cell sourcecode with the magic commands already commented out
+            metadata: nbgrader metadata of the cell - the score is recorded for autograded test cells
+            tokens: If True collect the normalized AST tokens - None: use collect_tokens
+            names: If True collect the names defined and used by the cell - None: use collect_names
+
+        Returns:
+            PreprocessedCell
+        """
+        points = None
+        if metadata is not None and metadata.get_type() is NbgraderCellType.AUTOGRADED_TESTS:
+            points = str(metadata.points)
+        if tokens is None:
+            tokens = self.collect_tokens
+        if names is None:
+            names = self.collect_names
+        return _preprocess_cell(sourcecode, points, tokens, names)
 
     def separate_imports(self, sourcecode: str) -> Tuple[str, List[str]]:
         """
-        remove all import statements and return them as separate list
+        remove all module level import statements and return them as separate list
         Args:
-            sourcecode:
+            sourcecode: cell sourcecode
 
         Returns:
+            str, list: sourcecode with the imports commented out, the removed imports
+        """
+        preprocessed = self.preprocess_cell(sourcecode)
+        return preprocessed.sourcecode, list(preprocessed.imports)
 
+    @classmethod
+    def hoist_imports(cls, imports: List[str]) -> List[str]:
         """
-        try:
-            root = ast.parse(sourcecode)
-        except:
-            return sourcecode, []
-        cell_import_nodes = []
-        for node in ast.walk(root):
-            if isinstance(node, ast.Import) or isinstance(node, ast.ImportFrom):
-                cell_import_nodes.append(node)
-            else:
-                continue
-        cell_imports = [ast.unparse(i) for i in cell_import_nodes]
-        for cell_import in cell_imports:
-            sourcecode = sourcecode.replace(cell_import, f"#{cell_import}")
-        return sourcecode, cell_imports
+        deduplicate the given imports keeping their order - __future__ imports are moved to the front
+        Args:
+            imports: import statements of all cells
 
-    def add_score_printout(self, sourcecode: str, metadata: NbgraderCellMetadata) -> str:
-        try:
-            parsed_cell_code = ast.parse(sourcecode)
-        except:
-            logger.error("Not able to find expression that prints out reached points in autograded test")
-            return sourcecode
-        if parsed_cell_code and len(parsed_cell_code.body) > 0:
-            score_exp = parsed_cell_code.body[-1]
-            if isinstance(score_exp, ast.Assert):
-                sourcecode += f"\nprint({metadata.points})"
-            else:
-                sourcecode += f"\nprint({ast.unparse(score_exp)})"
-        else:
-            pass
-        return sourcecode
+        Returns:
+            list: import statements to put at the top of the generated file
+        """
+        unique_imports = dict.fromkeys(imports)
+        future_imports = [i for i in unique_imports if i.startswith("from __future__ ")]
+        return future_imports + [i for i in unique_imports if not i.startswith("from __future__ ")]
 
     def cmdline_tool(self):
         code = """
@@ -192,15 +350,365 @@ def main(argv=None):
         argv = sys.argv
     parser = argparse.ArgumentParser(prog='nbgrader extracted code cells')
     parser.add_argument('--hide_cell_output', action="store_true")
+    parser.add_argument('--no_output_capture', action="store_true")
     parser.add_argument('--suppress_exception', action='store_true')
-    args = parser.parse_args()
+    parser.add_argument('--policy', choices=NotebookContext.POLICIES)
+    parser.add_argument('--max_errors', type=int)
+    args = parser.parse_args(argv[1:])
     notebook = TestNbgraderNotebook()
     notebook.show_output = not args.hide_cell_output
+    notebook.capture_output = not args.no_output_capture
     notebook.suppress_exception = args.suppress_exception
+    notebook.policy = args.policy or "{policy}"
+    notebook.max_errors = args.max_errors if args.max_errors is not None else {max_errors}
+    notebook.results_file = "results.json"
     notebook.test_cells()
 
 
 if __name__ == '__main__':
     sys.exit(main())
         """
+        code = code.replace("{policy}", self.policy).replace("{max_errors}", str(self.max_errors))
         return code
+
+
+def _split_lines(sourcecode: str) -> List[str]:
+    """
+    split the given sourcecode into lines keeping the line breaks
+    only \\n, \\r\\n and \\r are line breaks so that the lines match the line numbers of the ast nodes
+    """
+    return [line for line in _LINE_BREAK.split(sourcecode) if line]
+
+
+class AstNormalizer(ast.NodeVisitor):
+    """
+    converts python code into a sequence of normalized AST tokens
+    identifiers and literal values are replaced by placeholders so that renaming
+    variables or changing constants does not hide copied answers
+    """
+
+    def __init__(self):
+        self.tokens: List[str] = []
+
+    def generic_visit(self, node: ast.AST):
+        token = type(node).__name__
+        if isinstance(node, ast.Constant):
+            token = f"{token}:{type(node.value).__name__}"
+        elif isinstance(node, (ast.operator, ast.cmpop, ast.unaryop, ast.boolop)):
+            token = f"op:{token}"
+        elif isinstance(node, ast.Attribute):
+            # attribute names usually refer to library api e.g. np.mean and are kept
+            token = f"{token}:{node.attr}"
+        self.tokens.append(token)
+        super().generic_visit(node)
+
+    @classmethod
+    def tokenize(cls, sourcecode: str) -> List[str]:
+        """
+        Get the normalized AST tokens of the given sourcecode
+
+        Returns:
+            list: tokens in pre-order - empty if the code can not be parsed
+        """
+        try:
+            root = ast.parse(sourcecode)
+        except (SyntaxError, ValueError):
+            return []
+        return cls.tokenize_tree(root)
+
+    @classmethod
+    def tokenize_tree(cls, root: ast.Module) -> List[str]:
+        """
+        Get the normalized AST tokens of the given parsed sourcecode
+        """
+        normalizer = cls()
+        for node in root.body:
+            normalizer.visit(node)
+        return normalizer.tokens
+
+
+class _CellNames(ast.NodeVisitor):
+    """
+    collects the module level names a cell defines and the names it reads before assigning them
+    statements are visited in evaluation order - names local to functions, lambdas, classes and
+    comprehensions are ignored and function bodies are visited after the cell since they run later
+    module level imports are hoisted and therefore neither define nor use names
+    """
+
+    def __init__(self):
+        self.defines = set()
+        self.uses = set()
+        # local and global declared names of the enclosing function like scopes
+        self._scopes: List[Tuple[set, set]] = []
+        self._deferred = []
+
+    def collect(self, root: ast.Module):
+        for node in root.body:
+            if not isinstance(node, (ast.Import, ast.ImportFrom)):
+                self.visit(node)
+        while self._deferred:
+            body, scopes = self._deferred.pop(0)
+            self._scopes = scopes
+            for node in body:
+                self.visit(node)
+        self._scopes = []
+
+    def _load(self, name: str):
+        if any(name in local_names for local_names, _ in self._scopes):
+            return
+        if name not in self.defines:
+            self.uses.add(name)
+
+    def _store(self, name: str):
+        if self._scopes and name not in self._scopes[-1][1]:
+            self._scopes[-1][0].add(name)
+        else:
+            self.defines.add(name)
+
+    @staticmethod
+    def _local_names(nodes: List[ast.AST]) -> Tuple[set, set]:
+        """
+        Get the names assigned and declared global in the given scope body
+        """
+        local_names = set()
+        global_names = set()
+        for node in nodes:
+            for child in ast.walk(node):
+                if isinstance(child, ast.Name) and not isinstance(child.ctx, ast.Load):
+                    local_names.add(child.id)
+                elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    local_names.add(child.name)
+                elif isinstance(child, ast.arg):
+                    local_names.add(child.arg)
+                elif isinstance(child, (ast.Import, ast.ImportFrom)):
+                    local_names.update((alias.asname or alias.name).split(".")[0] for alias in child.names)
+                elif isinstance(child, ast.Global):
+                    global_names.update(child.names)
+        return local_names - global_names, global_names
+
+    def visit_Name(self, node: ast.Name):
+        if isinstance(node.ctx, ast.Load):
+            self._load(node.id)
+        elif isinstance(node.ctx, ast.Store):
+            self._store(node.id)
+
+    def visit_Assign(self, node: ast.Assign):
+        self.visit(node.value)
+        for target in node.targets:
+            self.visit(target)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign):
+        self.visit(node.annotation)
+        if node.value is not None:
+            self.visit(node.value)
+            self.visit(node.target)
+
+    def visit_AugAssign(self, node: ast.AugAssign):
+        if isinstance(node.target, ast.Name):
+            self._load(node.target.id)
+        self.visit(node.value)
+        self.visit(node.target)
+
+    def visit_NamedExpr(self, node: ast.NamedExpr):
+        self.visit(node.value)
+        self.visit(node.target)
+
+    def visit_For(self, node: ast.For):
+        self.visit(node.iter)
+        self.visit(node.target)
+        for child in node.body + node.orelse:
+            self.visit(child)
+
+    visit_AsyncFor = visit_For
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler):
+        if node.type is not None:
+            self.visit(node.type)
+        if node.name:
+            self._store(node.name)
+        for child in node.body:
+            self.visit(child)
+
+    def _visit_arguments(self, args: ast.arguments):
+        for default in args.defaults + [default for default in args.kw_defaults if default is not None]:
+            self.visit(default)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef):
+        for child in node.decorator_list:
+            self.visit(child)
+        self._visit_arguments(node.args)
+        self._store(node.name)
+        # the body runs when the function is called - after the names of the cell are assigned
+        scope = self._local_names([node.args, *node.body])
+        self._deferred.append((node.body, self._scopes + [scope]))
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node: ast.Lambda):
+        self._visit_arguments(node.args)
+        self._deferred.append(([node.body], self._scopes + [self._local_names([node.args])]))
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        for child in node.decorator_list + node.bases + [keyword.value for keyword in node.keywords]:
+            self.visit(child)
+        self._scopes.append(self._local_names(node.body))
+        for child in node.body:
+            self.visit(child)
+        self._scopes.pop()
+        self._store(node.name)
+
+    def _visit_comprehension(self, node: ast.AST, elements: List[ast.AST]):
+        generators = node.generators
+        # the first iterable is evaluated in the enclosing scope
+        self.visit(generators[0].iter)
+        self._scopes.append(self._local_names([generator.target for generator in generators]))
+        for i, generator in enumerate(generators):
+            if i > 0:
+                self.visit(generator.iter)
+            self.visit(generator.target)
+            for condition in generator.ifs:
+                self.visit(condition)
+        for element in elements:
+            self.visit(element)
+        self._scopes.pop()
+
+    def visit_ListComp(self, node: ast.ListComp):
+        self._visit_comprehension(node, [node.elt])
+
+    visit_SetComp = visit_ListComp
+    visit_GeneratorExp = visit_ListComp
+
+    def visit_DictComp(self, node: ast.DictComp):
+        self._visit_comprehension(node, [node.key, node.value])
+
+    def visit_Import(self, node: ast.Import):
+        # imports nested in blocks or functions
+        for alias in node.names:
+            self._store((alias.asname or alias.name).split(".")[0])
+
+    visit_ImportFrom = visit_Import
+
+    def visit_MatchAs(self, node):
+        self.generic_visit(node)
+        if node.name:
+            self._store(node.name)
+
+    def visit_MatchStar(self, node):
+        if node.name:
+            self._store(node.name)
+
+    def visit_MatchMapping(self, node):
+        self.generic_visit(node)
+        if node.rest:
+            self._store(node.rest)
+
+
+class PreprocessedCell(NamedTuple):
+    """
+    result of preprocessing a cell for the generated code
+    """
+    sourcecode: str
+    imports: Tuple[str, ...]
+    defines: Tuple[str, ...]
+    uses: Tuple[str, ...]
+    # normalized AST tokens used by the SimilarityIndex
+    tokens: Tuple[str, ...] = ()
+
+
+def _cell_sourcecode(source: Optional[Union[str, Sequence[str]]]) -> str:
+    """
+    join the cell source lines and comment out lines that use magic commands
+    """
+    if not source:
+        return ""
+    if isinstance(source, str):
+        source = _split_lines(source)
+    code = ""
+    for line in source:
+        if line.startswith("%"):
+            line = f"#{line}"
+        if line.strip().startswith("!"):
+            line = f"#{line}"
+        code += line
+    return code
+
+
+def _preprocess_task(task: Tuple[Union[str, Tuple[str, ...]], Optional[str], bool, bool]) -> PreprocessedCell:
+    """
+    preprocess a cell given as (source, points, tokens, names) - points is None for cells that are not autograded tests
+    module level function to be usable in worker processes
+    """
+    source, points, tokens, names = task
+    return _preprocess_cell(_cell_sourcecode(source), points, tokens, names)
+
+
+@lru_cache(maxsize=4096)
+def _preprocess_cell(
+        sourcecode: str,
+        points: Optional[str] = None,
+        tokens: bool = False,
+        names: bool = False
+) -> PreprocessedCell:
+    """
+    preprocess the given cell sourcecode with a single parse:
+    comment out the module level imports, record the score of autograded test cells,
+    optionally collect the names defined and used by the cell and its normalized AST tokens
+    the results are cached since most cells are identical across submissions
+    Args:
+        sourcecode: cell sourcecode
+        points: max points of an autograded test cell - None for other cells
+        tokens: If True collect the normalized AST tokens
+        names: If True collect the names defined and used by the cell - only needed by the skip_dependents policy
+    """
+    try:
+        root = ast.parse(sourcecode)
+    except:
+        if points is not None:
+            logger.error("Not able to find expression that records reached points in autograded test")
+        return PreprocessedCell(sourcecode, (), (), (), ())
+    lines = _split_lines(sourcecode)
+    line_offsets = [0]
+    for line in lines:
+        line_offsets.append(line_offsets[-1] + len(line))
+
+    def offset(lineno: int, col_offset: int) -> int:
+        # col offsets are utf-8 byte offsets
+        line = lines[lineno - 1] if lineno <= len(lines) else ""
+        return line_offsets[lineno - 1] + len(line.encode("utf-8")[:col_offset].decode("utf-8"))
+
+    # edits as (start, end, replacement) on character offsets
+    edits = []
+    import_nodes = [node for node in root.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    lines_in_use = {}
+    for node in root.body:
+        for line_number in {node.lineno, node.end_lineno}:
+            lines_in_use[line_number] = lines_in_use.get(line_number, 0) + 1
+    # the import statements are sliced from the source - ast.unparse is not available before python 3.9
+    imports = []
+    for node in import_nodes:
+        imports.append(sourcecode[offset(node.lineno, node.col_offset):offset(node.end_lineno, node.end_col_offset)])
+        if lines_in_use[node.lineno] == 1 and lines_in_use[node.end_lineno] == 1:
+            for line_number in range(node.lineno, node.end_lineno + 1):
+                edits.append((line_offsets[line_number - 1], line_offsets[line_number - 1], "#"))
+        else:
+            edits.append((offset(node.lineno, node.col_offset), offset(node.end_lineno, node.end_col_offset), "pass"))
+    if points is not None and root.body:
+        score_exp = root.body[-1]
+        if isinstance(score_exp, ast.Expr):
+            start = offset(score_exp.lineno, score_exp.col_offset)
+            end = offset(score_exp.end_lineno, score_exp.end_col_offset)
+            edits.append((start, end, f"notebook_context.record_score({sourcecode[start:end]})"))
+        elif isinstance(score_exp, ast.Assert):
+            edits.append((len(sourcecode), len(sourcecode), f"\nnotebook_context.record_score({points})"))
+    for start, end, replacement in sorted(edits, reverse=True):
+        sourcecode = sourcecode[:start] + replacement + sourcecode[end:]
+    cell_names = _CellNames()
+    if names:
+        cell_names.collect(root)
+    return PreprocessedCell(
+            sourcecode=sourcecode,
+            imports=tuple(imports),
+            defines=tuple(sorted(cell_names.defines)),
+            uses=tuple(sorted(cell_names.uses)),
+            tokens=tuple(AstNormalizer.tokenize_tree(root)) if tokens else ()
+    )
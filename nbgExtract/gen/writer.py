@@ -0,0 +1,151 @@
+import logging
+import queue
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Set, Union
+
+if TYPE_CHECKING:
+    from nbgExtract.progress import ProgressTracker
+
+logger = logging.getLogger(__name__)
+
+
+class GeneratedFileWriter:
+    """
+    background writer for generated files
+    files are queued in a bounded queue and written by worker threads
+    either as loose files below a target directory or into a single zip file
+    """
+
+    def __init__(
+            self,
+            target: Union[str, Path],
+            max_workers: int = 4,
+            max_queue_size: int = 64,
+            zip_path: Optional[Union[str, Path]] = None,
+            progress: Optional["ProgressTracker"] = None
+    ):
+        """
+        constructor
+        Args:
+            target: target directory to store the files in (ignored if zip_path is given)
+            max_workers: number of writer threads (a zip file is always written by a single thread)
+            max_queue_size: maximum number of queued files - write() blocks if the queue is full
+            zip_path: If set all files are written into this zip file instead of the target directory
+            progress: If set the write latency of each file is reported as "write" stage
+        """
+        self.target = Path(target)
+        self.zip_path = Path(zip_path) if zip_path is not None else None
+        self.max_workers = 1 if self.zip_path is not None else max(1, max_workers)
+        self.queue = queue.Queue(maxsize=max(1, max_queue_size))
+        self.progress = progress
+        self.errors: List[Exception] = []
+        self.written = 0
+        self._created_dirs: Set[Path] = set()
+        self._lock = threading.Lock()
+        self._archive: Optional[zipfile.ZipFile] = None
+        # set once the zip file was created so that a restarted writer appends to it
+        self._zip_created = False
+        self._threads: List[threading.Thread] = []
+
+    def __enter__(self) -> "GeneratedFileWriter":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(raise_errors=exc_val is None)
+
+    def start(self):
+        """
+        start the writer threads
+        a writer restarted after close appends to the zip file it created
+        """
+        if self._threads:
+            return
+        if self.zip_path is not None:
+            self.zip_path.parent.mkdir(parents=True, exist_ok=True)
+            mode = "a" if self._zip_created else "w"
+            self._archive = zipfile.ZipFile(self.zip_path, mode=mode, compression=zipfile.ZIP_DEFLATED)
+            self._zip_created = True
+        for i in range(self.max_workers):
+            thread = threading.Thread(target=self._work, name=f"GeneratedFileWriter-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def write(self, relative_path: Union[str, Path], content: str):
+        """
+        queue the given content to be written to the given path relative to the target
+        blocks if the queue is full
+        Args:
+            relative_path: file path relative to the target directory or the root of the zip file
+            content: file content
+        """
+        if not self._threads:
+            self.start()
+        self.queue.put((Path(relative_path), content))
+
+    def close(self, raise_errors: bool = True):
+        """
+        wait until all queued files are written and stop the writer threads
+        Args:
+            raise_errors: If True raise the first error that occurred while writing
+        """
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+        if self.errors and raise_errors:
+            raise self.errors[0]
+
+    def _work(self):
+        """
+        consume queued files until the stop marker is received
+        """
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                relative_path, content = item
+                start = time.perf_counter()
+                self._write_file(relative_path, content)
+                if self.progress is not None:
+                    self.progress.stage_done("write", time.perf_counter() - start)
+            except Exception as ex:
+                logger.error(f"Failed to write {item[0]}: {ex}")
+                with self._lock:
+                    self.errors.append(ex)
+            finally:
+                self.queue.task_done()
+
+    def _write_file(self, relative_path: Path, content: str):
+        """
+        write a single file
+        """
+        if self._archive is not None:
+            with self._lock:
+                self._archive.writestr(relative_path.as_posix(), content)
+                self.written += 1
+            return
+        file_path = self.target.joinpath(relative_path)
+        self._ensure_dir(file_path.parent)
+        with open(file_path, mode="w", encoding="utf8") as fp:
+            fp.write(content)
+        with self._lock:
+            self.written += 1
+
+    def _ensure_dir(self, directory: Path):
+        """
+        create the given directory once
+        """
+        if directory in self._created_dirs:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._created_dirs.add(directory)
@@ -1,11 +1,11 @@
 import argparse
+import json
 import logging
 import sys
 import os
 import traceback
 
 from nbgExtract import logger
-from nbgExtract.notebook import GraderNotebook, Submission, Submissions
 
 
 def main(argv=None):
@@ -20,43 +20,182 @@ def main(argv=None):
     try:
         parser = argparse.ArgumentParser(description='nbg-code - extract code cells from the submission and merge the '
                                                      'cells with the test cells from the source')
+        parser.add_argument("mode", nargs="?", choices=["generate", "watch", "report"], default="generate",
+                            help="generate: generate the python files once (default) - "
+                                 "watch: continuously generate newly arrived or changed submissions of --watch_dir - "
+                                 "report: aggregate the grading results of --results")
         parser.add_argument("-d", "--debug", dest="debug", action="store_true", help="show debug info")
         parser.add_argument("-wcc", "--with_cell_comments",
                             action="store_true", help="add cell metadata as python comment")
         parser.add_argument("--submission", help="location of the submission notebook")
         parser.add_argument("--submission_zip",
                             help="location of the zip file containing multiple submission notebooks")
-        parser.add_argument("--source", required=True, help="location of the source notebook for the submission")
+        parser.add_argument("--only", nargs="+",
+                            help="only generate the submissions of the given groups e.g. Group_17 "
+                                 "- for --submission_zip a persistent index stored next to the zip file is used")
+        parser.add_argument("--submissions",
+                            help="location of a directory, zip or tar file containing multiple submission notebooks "
+                                 "- nested archives are supported")
+        parser.add_argument("--source", help="location of the source notebook for the submission")
+        parser.add_argument("--batch",
+                            help="JSON or YAML manifest with a list of assignments to generate "
+                                 "(source, submissions, template, output_folder, output_zip)")
+        parser.add_argument("--workers", type=int,
+                            help="number of worker processes for --batch (0: run in this process)")
+        parser.add_argument("--watch_dir", help="drop directory to watch for submissions in watch mode")
+        parser.add_argument("--interval", type=float, default=2.0, help="polling interval in seconds in watch mode")
+        parser.add_argument("--grade", action="store_true",
+                            help="run the generated files in watch mode - results are stored in the output folder")
+        parser.add_argument("--results", nargs="+",
+                            help="result files or glob patterns with JSON line records to aggregate in report mode")
+        parser.add_argument("--results_csv", help="CSV file to export the aggregated gradebook to in report mode")
         parser.add_argument("--outputPython", default="/tmp/submission.py", help="target file to store the result")
         parser.add_argument("--output_folder", default="/tmp/submissions", help="target directory to store the result")
+        parser.add_argument("--output_zip", help="zip file to store the generated files in instead of the output folder")
+        parser.add_argument("--writer_threads", type=int, default=4,
+                            help="number of background threads writing the generated files")
+        parser.add_argument("--similarity_report",
+                            help="JSON file to store pairs of submissions with near-duplicate answers in")
+        parser.add_argument("--similarity_threshold", type=float, default=0.8,
+                            help="minimum estimated similarity of reported near-duplicate answers")
+        parser.add_argument("--checksum_report",
+                            help="JSON file to store the submissions with modified locked or graded cells in")
+        parser.add_argument("--release",
+                            help="location of the released notebook with the expected nbgrader checksums and "
+                                 "answer scaffolds - if not set the checksums stored in the submissions are used "
+                                 "and the scaffolds are derived from the source notebook")
+        parser.add_argument("--runtime", choices=["import", "inline", "sibling"], default="import",
+                            help="how generated files get the NotebookContext: import it from nbgExtract (default), "
+                                 "inline it into each file or write it once as nbg_runtime.py into the output folder")
+        parser.add_argument("--policy", choices=["run_all", "skip_dependents"], default="run_all",
+                            help="execution policy of the generated files: run all cells (default) or "
+                                 "skip cells using names of failed cells recording zero points")
+        parser.add_argument("--max_errors", type=int,
+                            help="generated files skip all remaining cells after the given number of cells raising "
+                                 "an exception - failing assertions are not counted")
+        parser.add_argument("--cell_workers", type=int, default=0,
+                            help="number of worker processes to preprocess the cells of large notebooks")
+        parser.add_argument("--status_file",
+                            help="JSON file that is periodically updated with progress, throughput, ETA "
+                                 "and the slowest submissions")
         parser.add_argument("--template", help="template to use for the python code generation")
         parser.add_argument("--only_merge_answers", action="store_true",
                             help="Only merge the answers to the source notebook. "
                                  "If not set merge only the test cells to the submission notebook")
 
         args = parser.parse_args(argv[1:])
+        logging.basicConfig()
         debug = args.debug
-        if debug:
-            logger.setLevel(level=logging.DEBUG)
+        # info level by default to show the progress summaries
+        logger.setLevel(level=logging.DEBUG if debug else logging.INFO)
 
+        if args.only and (args.batch or args.mode != "generate" or not (args.submission_zip or args.submissions)):
+            parser.error("--only requires --submission_zip or --submissions in generate mode")
+        if args.batch:
+            from nbgExtract.batch import BatchRunner
+            runner = BatchRunner.from_manifest(
+                    args.batch,
+                    max_workers=args.workers,
+                    debug=debug,
+                    status_file=args.status_file
+            )
+            results = runner.run()
+            return 1 if any(result.error for result in results) else 0
+        if args.mode == "report":
+            if not args.results:
+                parser.error("--results is required in report mode")
+            from nbgExtract.results import ResultTable
+            table = ResultTable.from_shards(args.results)
+            totals, _ = table.statistics()
+            if args.results_csv:
+                table.to_csv(args.results_csv, totals=totals)
+            print(json.dumps(table.summary(), indent=2))
+            return 0
+        if not args.source:
+            parser.error("--source is required unless --batch is used")
+        from nbgExtract.notebook import GraderNotebook, Submission, Submissions
         source = GraderNotebook(args.source)
-        if args.submission:
+        if args.mode == "watch":
+            from nbgExtract.watch import SubmissionWatcher
+            if not args.watch_dir:
+                parser.error("--watch_dir is required in watch mode")
+            watcher = SubmissionWatcher(
+                    args.watch_dir,
+                    source_notebook=source,
+                    output_folder=args.output_folder,
+                    template_filepath=args.template,
+                    only_merge_answers=args.only_merge_answers,
+                    with_cell_comments=args.with_cell_comments,
+                    interval=args.interval,
+                    grade=args.grade,
+                    runtime=args.runtime,
+                    policy=args.policy,
+                    max_errors=args.max_errors,
+                    status_file=args.status_file,
+                    debug=debug
+            )
+            watcher.run()
+        elif args.submission:
             submission = Submission(args.submission)
             merged_submission = submission.merge_code(source, args.only_merge_answers)
             python_code = merged_submission.as_python_code(args.template)
             with open(args.outputPython, mode="w") as fp:
                 fp.write(python_code)
-        elif args.submission_zip:
-            submissions = Submissions.from_zip(args.submission_zip, debug=debug)
+        elif args.submission_zip or args.submissions:
+            if args.submission_zip:
+                submissions = Submissions.from_zip(args.submission_zip, debug=debug, only=args.only)
+            else:
+                submissions = Submissions.from_source(args.submissions, debug=debug, only=args.only)
+            from nbgExtract.gen.writer import GeneratedFileWriter
+            from nbgExtract.progress import ProgressTracker
             submissions.source_notebook = source
+            writer = GeneratedFileWriter(
+                    args.output_folder,
+                    max_workers=args.writer_threads,
+                    zip_path=args.output_zip
+            )
+            similarity_index = None
+            if args.similarity_report:
+                from nbgExtract.similarity import SimilarityIndex
+                similarity_index = SimilarityIndex(
+                        threshold=args.similarity_threshold,
+                        template_notebook=GraderNotebook(args.release) if args.release else None
+                )
+            checksum_verifier = None
+            if args.checksum_report:
+                from nbgExtract.checksum import ChecksumVerifier
+                release = GraderNotebook(args.release) if args.release else None
+                checksum_verifier = ChecksumVerifier(release_notebook=release)
             submissions.generate_python_files(
                     target_dir=args.output_folder,
                     template_filepath=args.template,
                     with_cell_comments=args.with_cell_comments,
-                    only_merge_answers=args.only_merge_answers
+                    only_merge_answers=args.only_merge_answers,
+                    writer=writer,
+                    similarity_index=similarity_index,
+                    checksum_verifier=checksum_verifier,
+                    runtime=args.runtime,
+                    policy=args.policy,
+                    max_errors=args.max_errors,
+                    progress=ProgressTracker(status_file=args.status_file),
+                    cell_workers=args.cell_workers
             )
+            import dataclasses
+            if similarity_index is not None:
+                pairs = similarity_index.candidate_pairs()
+                with open(args.similarity_report, mode="w") as fp:
+                    json.dump([dataclasses.asdict(pair) for pair in pairs], fp, indent=2)
+                logger.info(f"Found {len(pairs)} near-duplicate pairs → {args.similarity_report}")
+            if checksum_verifier is not None:
+                report = {
+                    name: [dataclasses.asdict(cell) for cell in cells]
+                    for name, cells in checksum_verifier.tampered.items()
+                }
+                with open(args.checksum_report, mode="w") as fp:
+                    json.dump(report, fp, indent=2)
+                logger.info(f"Found {len(report)} tampered submissions → {args.checksum_report}")
         else:
-            logger.info("No submissions were provided. Please use --submission or --submission_zip")
+            logger.info("No submissions were provided. Please use --submission, --submission_zip or --submissions")
 
     except KeyboardInterrupt:
         ### handle keyboard interrupt ###
@@ -9,9 +9,15 @@ import typing
 from typing import Dict, Union
 from pathlib import Path
 from . import logger
-from nbgExtract.gen.generator import NbgCodeGenerator
 from .cells import Cell, NbgraderCellType
 
+if typing.TYPE_CHECKING:
+    from .checksum import ChecksumVerifier
+    from .gen.writer import GeneratedFileWriter
+    from .progress import ProgressTracker
+    from .similarity import SimilarityIndex
+    from .sources import SubmissionSource
+
 
 class GraderNotebook:
     """
@@ -81,6 +87,8 @@ class GraderNotebook:
                 self.notebook_filepath = notebook.name
                 self.name = notebook.name.replace(".ipynb", "")
                 self.notebook = json.load(notebook)
+            elif isinstance(notebook, dict):
+                self.notebook = notebook
             self.cells = []
             for record in self.notebook["cells"]:
                 try: 
@@ -222,6 +230,7 @@ class Submission(GraderNotebook):
             nbgrader = code_cell.get_nbg_metadata()
             merge_cell = dataclasses.replace(code_cell)
             notebook = source_notebook.notebook
+            # modified locked cells of the submission are replaced by the source version - see ChecksumVerifier
             if nbgrader and nbgrader.get_type() is NbgraderCellType.AUTOGRADED_ANSWER:
                 if cell_id in self.code_cells:
                     merge_cell = dataclasses.replace(self.code_cells[cell_id])
@@ -297,7 +306,15 @@ class Submissions:
             target_dir: str,
             template_filepath: str = None,
             with_cell_comments: bool = False,
-            only_merge_answers: bool = False
+            only_merge_answers: bool = False,
+            writer: typing.Optional["GeneratedFileWriter"] = None,
+            similarity_index: typing.Optional["SimilarityIndex"] = None,
+            checksum_verifier: typing.Optional["ChecksumVerifier"] = None,
+            runtime: str = "import",
+            policy: str = "run_all",
+            max_errors: typing.Optional[int] = None,
+            progress: typing.Optional["ProgressTracker"] = None,
+            cell_workers: int = 0
     ):
         """
         generate python files of the submissions
@@ -305,37 +322,84 @@ class Submissions:
             target_dir: target directory to store the file
             template_filepath: template to use to generate the python files. If None NotebookContext is used
             with_cell_comments(bool): if true add jupyter cell metadata as python comments 
+            writer: background writer to write the files with. If None a writer for the target directory is used
+            similarity_index: If set the answers of the submissions are added to the index in the same pass
+                              the source notebook is used as template if the index has none
+            checksum_verifier: If set the locked cells of the submissions are verified in the same pass
+            runtime: how the generated files get the NotebookContext - see NbgCodeGenerator
+            policy: execution policy of the generated files - see NotebookContext
+            max_errors: maximum number of failing cells of the generated files - see NotebookContext
+            progress: tracker for throughput, stage latencies and ETA. If None a tracker that only logs is used
+            cell_workers: number of worker processes to preprocess the cells of large notebooks - see NbgCodeGenerator
         """
+        from .gen.generator import NbgCodeGenerator
+        from .gen.writer import GeneratedFileWriter
+        from .progress import ProgressTracker
         path = Path(target_dir)
-        if not path.exists():
-            logger.info(f"Target directory does not exist → creating directory '{target_dir}'")
-            path.mkdir(exist_ok=True, parents=True)
-        if not path.is_dir():
-            logger.error(f"Target directory '{target_dir}' is not a directory")
-            return
+        if writer is None or writer.zip_path is None:
+            if not path.exists():
+                logger.info(f"Target directory does not exist → creating directory '{target_dir}'")
+                path.mkdir(exist_ok=True, parents=True)
+            if not path.is_dir():
+                logger.error(f"Target directory '{target_dir}' is not a directory")
+                return
         if self.source_notebook is None:
             logger.info("Source notebook is not defined!")
+        if writer is None:
+            writer = GeneratedFileWriter(path)
         total = len(self)
-        for i, submission in enumerate(self.submissions, start=1):
-            merged_notebook: GraderNotebook = submission.merge_code(self.source_notebook, only_merge_answers=only_merge_answers)
-            py_file_name = f"test_{self.source_notebook.name}_submission_{i:04}.py"
-            py_file_path = path.joinpath(py_file_name)
-            if template_filepath is None:
-                generator = NbgCodeGenerator()
-                generator.generate_file(merged_notebook, target=Path(target_dir))
-            else:
-                py_code = merged_notebook.as_python_code(template_filepath, with_cell_comments=with_cell_comments)
-                with open(py_file_path, mode="w", encoding='utf8') as f:
-                    f.write(py_code)
-            logger.debug(f"({i:04}/{total:04}) Generated {py_file_name}")
+        if progress is None:
+            progress = ProgressTracker()
+        if progress.total is None:
+            progress.total = total
+        if not progress.name:
+            progress.name = self.source_notebook.name
+        if writer.progress is None:
+            writer.progress = progress
+        if similarity_index is not None and not similarity_index.templates and self.source_notebook is not None:
+            similarity_index.add_template(self.source_notebook)
+        generator = NbgCodeGenerator(
+                runtime=runtime,
+                policy=policy,
+                max_errors=max_errors,
+                cell_workers=cell_workers,
+                collect_tokens=similarity_index is not None
+        )
+        with writer, generator:
+            for i, submission in enumerate(self.submissions, start=1):
+                with progress.item(str(submission.notebook_filepath)):
+                    if similarity_index is not None:
+                        with progress.stage("similarity"):
+                            similarity_index.add_submission(submission)
+                    if checksum_verifier is not None:
+                        with progress.stage("checksum"):
+                            checksum_verifier.verify(submission)
+                    with progress.stage("merge"):
+                        merged_notebook: GraderNotebook = submission.merge_code(self.source_notebook, only_merge_answers=only_merge_answers)
+                    py_file_name = f"test_{self.source_notebook.name}_submission_{i:04}.py"
+                    with progress.stage("generate"):
+                        if template_filepath is None:
+                            generator.generate_file(merged_notebook, target=path, writer=writer)
+                        else:
+                            py_code = merged_notebook.as_python_code(template_filepath, with_cell_comments=with_cell_comments)
+                            writer.write(py_file_name, py_code)
+                logger.debug(f"({i:04}/{total:04}) Generated {py_file_name}")
+        progress.close()
 
     @classmethod
-    def from_zip(cls, file_path: typing.Union[str,  Path], debug: bool = False) -> "Submissions":
+    def from_zip(
+            cls,
+            file_path: typing.Union[str,  Path],
+            debug: bool = False,
+            only: typing.Optional[typing.List[str]] = None
+    ) -> "Submissions":
         """
         Generate Submissions from given zip file
         Args:
             file_path: zip file path
-            source_notebook: source notebook of the submissions
+            debug: if True show debug info
+            only: If set only read the submissions of the given groups e.g. ["Group_17"]
+                  via the persistent index of the archive without touching the other members
 
         Returns:
             Submissions
@@ -343,16 +407,60 @@ class Submissions:
         path = Path(file_path).expanduser()
         if not path.is_file():
             raise Exception(f"{path} is not a file")
+        if only:
+            from .zipindex import ZipIndex
+            index = ZipIndex.load(path)
+            entries = index.select(only)
+            if not entries:
+                logger.info(f"No submissions of {', '.join(only)} found in {path}")
+            submissions = Submissions(debug=debug)
+            for submission_file in index.iter_notebooks(entries):
+                submissions.add_submission(Submission(submission_file.as_file(), debug=debug))
+            return submissions
         if not zipfile.is_zipfile(path):
             raise Exception(f"{path} is not a zip file")
+        from .sources import ZipSource
+        return cls.from_source(ZipSource(path), debug=debug)
+
+    @classmethod
+    def from_source(
+            cls,
+            source: typing.Union[str, Path, "SubmissionSource"],
+            debug: bool = False,
+            only: typing.Optional[typing.List[str]] = None
+    ) -> "Submissions":
+        """
+        Generate Submissions from the given submission source
+        Args:
+            source: submission source or location of a directory, zip or tar file
+                    nested archives are read without extracting them to disk
+            debug: if True show debug info
+            only: If set only load the submissions of the given groups e.g. ["Group_17"]
+
+        Returns:
+            Submissions
+        """
+        from .sources import SubmissionSource, matches_group
+        if not isinstance(source, SubmissionSource):
+            source = SubmissionSource.for_path(source)
         submissions = Submissions(debug=debug)
-        # https://docs.python.org/3/library/zipfile.html#zipfile.ZipFile.open
-        with zipfile.ZipFile(path, 'r') as archive:
-            for file_name in archive.namelist():
-                if ".ipynb" in file_name:
-                    notebook_content = archive.read(file_name)
-                    notebook_file = io.BytesIO(notebook_content)
-                    notebook_file.name = file_name
-                    submission = Submission(notebook_file, debug=debug)
-                    submissions.add_submission(submission)
+        for submission_file in source:
+            if only and not any(matches_group(submission_file.group, selector) for selector in only):
+                continue
+            submission = Submission(submission_file.as_file(), debug=debug)
+            submissions.add_submission(submission)
         return submissions
+
+    def groups(self) -> typing.Dict[str, typing.List[Submission]]:
+        """
+        Get the submissions grouped by student/group
+        e.g. "Group 1_122542_assignsubmission_file"
+
+        Returns:
+            dict: group name → submissions of the group
+        """
+        from .sources import group_of
+        groups = {}
+        for submission in self.submissions:
+            groups.setdefault(group_of(str(submission.notebook_filepath)), []).append(submission)
+        return groups
@@ -0,0 +1,215 @@
+import heapq
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from . import logger
+
+
+class ProgressTracker:
+    """
+    tracks throughput, per stage latency, ETA and the slowest items of a batch run
+    the status is logged and optionally flushed periodically as JSON file that other tools can poll
+    """
+
+    def __init__(
+            self,
+            total: Optional[int] = None,
+            name: str = "",
+            status_file: Optional[Union[str, Path]] = None,
+            flush_interval: float = 2.0,
+            log_interval: float = 10.0,
+            slowest: int = 5,
+            alpha: float = 0.2
+    ):
+        """
+        constructor
+        Args:
+            total: expected number of items - None if unknown e.g. in watch mode
+            name: name of the run
+            status_file: If set the status is written to this JSON file
+            flush_interval: minimum seconds between two status file updates
+            log_interval: minimum seconds between two progress log messages
+            slowest: number of slowest items to keep
+            alpha: smoothing factor of the moving average latencies
+        """
+        self.total = total
+        self.name = name
+        self.status_file = Path(status_file) if status_file is not None else None
+        self.flush_interval = flush_interval
+        self.log_interval = log_interval
+        self.max_slowest = slowest
+        self.alpha = alpha
+        self.done = 0
+        self.failed = 0
+        self.start_time = time.monotonic()
+        self.stage_latencies: Dict[str, float] = {}
+        self.item_latency: Optional[float] = None
+        self._slowest: List[Tuple[float, str]] = []
+        self._last_flush = 0.0
+        self._last_log = self.start_time
+        # stages may be recorded by other threads e.g. the writer threads of GeneratedFileWriter
+        self._lock = threading.Lock()
+
+    def _average(self, current: Optional[float], value: float) -> float:
+        """
+        exponential moving average
+        """
+        if current is None:
+            return value
+        return self.alpha * value + (1 - self.alpha) * current
+
+    @contextmanager
+    def stage(self, stage_name: str):
+        """
+        measure the latency of a processing stage of the current item
+        Args:
+            stage_name: name of the stage e.g. "merge", "generate"
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_done(stage_name, time.perf_counter() - start)
+
+    def stage_done(self, stage_name: str, latency: float):
+        """
+        record the latency of a processing stage - thread safe
+        Args:
+            stage_name: name of the stage
+            latency: duration of the stage in seconds
+        """
+        with self._lock:
+            self.stage_latencies[stage_name] = self._average(self.stage_latencies.get(stage_name), latency)
+
+    def item_done(self, item_name: str, duration: float, failed: bool = False, count: int = 1):
+        """
+        record a processed item
+        Args:
+            item_name: name of the item e.g. the notebook name
+            duration: processing time in seconds
+            failed: True if the item could not be processed
+            count: number of units the item consists of e.g. the submissions of a batch job
+        """
+        self.done += count
+        if failed:
+            self.failed += count
+        self.item_latency = self._average(self.item_latency, duration)
+        entry = (duration, item_name)
+        if len(self._slowest) < self.max_slowest:
+            heapq.heappush(self._slowest, entry)
+        elif entry > self._slowest[0]:
+            heapq.heapreplace(self._slowest, entry)
+        now = time.monotonic()
+        if now - self._last_log >= self.log_interval:
+            self._last_log = now
+            logger.info(self.summary())
+        self.flush()
+
+    @contextmanager
+    def item(self, item_name: str):
+        """
+        measure the processing of an item
+        """
+        start = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self.item_done(item_name, time.perf_counter() - start, failed=failed)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start_time
+
+    @property
+    def rate(self) -> float:
+        """
+        processed items per second
+        """
+        elapsed = self.elapsed
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """
+        estimated seconds until all items are processed - None if unknown
+        """
+        if self.total is None:
+            return None
+        remaining = max(self.total - self.done, 0)
+        if remaining == 0:
+            return 0.0
+        rate = self.rate
+        return remaining / rate if rate > 0 else None
+
+    def _stage_latencies(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.stage_latencies)
+
+    def slowest(self) -> List[Tuple[str, float]]:
+        """
+        Get the slowest items - slowest first
+        """
+        return [(item_name, duration) for duration, item_name in sorted(self._slowest, reverse=True)]
+
+    def status(self) -> dict:
+        """
+        Get the current status as JSON compatible dict
+        """
+        return {
+            "name": self.name,
+            "done": self.done,
+            "failed": self.failed,
+            "total": self.total,
+            "elapsed": round(self.elapsed, 3),
+            "rate": round(self.rate, 3),
+            "eta": None if self.eta is None else round(self.eta, 1),
+            "item_latency": self.item_latency,
+            "stage_latencies": self._stage_latencies(),
+            "slowest": [{"item": item_name, "duration": duration} for item_name, duration in self.slowest()],
+            "updated": time.time()
+        }
+
+    def summary(self) -> str:
+        """
+        Get a one line progress summary
+        """
+        total = "?" if self.total is None else f"{self.total:04}"
+        eta = "?" if self.eta is None else f"{self.eta:.0f}s"
+        stages = " ".join(f"{stage}={latency * 1000:.1f}ms" for stage, latency in self._stage_latencies().items())
+        return f"{self.name} ({self.done:04}/{total}) {self.rate:.1f}/s ETA {eta} {stages}".strip()
+
+    def flush(self, force: bool = False):
+        """
+        write the status file if the flush interval has elapsed
+        Args:
+            force: write the status file regardless of the flush interval
+        """
+        if self.status_file is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+        self.status_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.status_file.with_name(f".{self.status_file.name}.tmp")
+        with open(tmp_file, mode="w", encoding="utf8") as fp:
+            json.dump(self.status(), fp, indent=2)
+        # atomic replace so that polling tools never see a partially written file
+        os.replace(tmp_file, self.status_file)
+
+    def close(self):
+        """
+        log the final summary and flush the status file
+        """
+        logger.info(self.summary())
+        slowest = ", ".join(f"{item_name} ({duration:.2f}s)" for item_name, duration in self.slowest())
+        if slowest:
+            logger.info(f"slowest: {slowest}")
+        self.flush(force=True)
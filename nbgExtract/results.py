@@ -0,0 +1,180 @@
+import csv
+import glob
+import json
+import math
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from . import logger
+
+MISSING = math.nan
+
+
+class ResultTable:
+    """
+    columnar table of grading results (submission × grade_id)
+    each grade_id column is an array of doubles - missing points are stored as NaN
+    so that tens of thousands of records need only 8 bytes per cell
+    rows are keyed by notebook name - the latest record of a regraded notebook replaces the earlier one
+    """
+
+    def __init__(self):
+        self.notebooks: List[str] = []
+        self.grade_ids: List[str] = []
+        self.columns: Dict[str, array] = {}
+        # notebook name → row
+        self._rows: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.notebooks)
+
+    def add_record(self, record: dict):
+        """
+        add a result record as generated by NotebookContext.generate_notebook_result
+        a record of an already added notebook replaces its row
+        Args:
+            record: dict with notebook name, total and grade_id → points
+        """
+        notebook = str(record.get("notebook"))
+        row = self._rows.get(notebook)
+        if row is None:
+            row = len(self.notebooks)
+            self._rows[notebook] = row
+            self.notebooks.append(notebook)
+            for column in self.columns.values():
+                column.append(MISSING)
+        else:
+            for column in self.columns.values():
+                column[row] = MISSING
+        for key, value in record.items():
+            if key in ("notebook", "total"):
+                continue
+            column = self.columns.get(key)
+            if column is None:
+                column = array("d", [MISSING]) * len(self.notebooks)
+                self.columns[key] = column
+                self.grade_ids.append(key)
+            column[row] = MISSING if value is None else float(value)
+
+    def load(self, shard: Union[str, Path]) -> int:
+        """
+        load a result shard with one JSON record per line
+        Args:
+            shard: location of the shard
+
+        Returns:
+            int: number of loaded records
+        """
+        loaded = 0
+        with open(shard, encoding="utf8") as fp:
+            for line_number, line in enumerate(fp, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as ex:
+                    logger.error(f"{shard}:{line_number}: {ex}")
+                    continue
+                self.add_record(record)
+                loaded += 1
+        return loaded
+
+    @classmethod
+    def from_shards(cls, patterns: Iterable[Union[str, Path]]) -> "ResultTable":
+        """
+        load all result shards matching the given glob patterns
+        Args:
+            patterns: shard locations or glob patterns e.g. "results/**/results.json"
+        """
+        table = cls()
+        for pattern in patterns:
+            for shard in sorted(glob.glob(str(pattern), recursive=True)):
+                table.load(shard)
+        return table
+
+    def statistics(self) -> Tuple[array, Dict[str, float]]:
+        """
+        compute the totals per submission and the pass rates per grade_id in one pass over the columns
+        a test is passed if it received more than 0 points
+
+        Returns:
+            array, dict: totals per submission, grade_id → pass rate of the submissions with a result
+        """
+        totals = array("d", bytes(8 * len(self)))
+        pass_rates = {}
+        for grade_id in self.grade_ids:
+            column = self.columns[grade_id]
+            passed = 0
+            graded = 0
+            for row, points in enumerate(column):
+                if points != points:  # NaN
+                    continue
+                graded += 1
+                totals[row] += points
+                if points > 0:
+                    passed += 1
+            pass_rates[grade_id] = passed / graded if graded else MISSING
+        return totals, pass_rates
+
+    def totals(self) -> array:
+        """
+        Get the total points per submission
+        """
+        return self.statistics()[0]
+
+    def pass_rates(self) -> Dict[str, float]:
+        """
+        Get the pass rate per grade_id
+        """
+        return self.statistics()[1]
+
+    def histogram(self, bins: int = 10, totals: Optional[array] = None) -> List[Tuple[float, float, int]]:
+        """
+        Get the histogram of the total scores
+        Args:
+            bins: number of equally sized bins
+            totals: precomputed totals
+
+        Returns:
+            list: (lower bound, upper bound, count) per bin
+        """
+        if totals is None:
+            totals = self.totals()
+        if not totals:
+            return []
+        low = min(totals)
+        high = max(totals)
+        width = (high - low) / bins if high > low else 1.0
+        counts = [0] * bins
+        for total in totals:
+            counts[min(int((total - low) / width), bins - 1)] += 1
+        return [(low + i * width, low + (i + 1) * width, count) for i, count in enumerate(counts)]
+
+    def to_csv(self, target: Union[str, Path], totals: Optional[array] = None):
+        """
+        export the gradebook as CSV with one row per submission
+        Args:
+            target: location of the CSV file
+            totals: precomputed totals
+        """
+        if totals is None:
+            totals = self.totals()
+        with open(target, mode="w", newline="", encoding="utf8") as fp:
+            writer = csv.writer(fp)
+            writer.writerow(["notebook", "total", *self.grade_ids])
+            for row, notebook in enumerate(self.notebooks):
+                points = [self.columns[grade_id][row] for grade_id in self.grade_ids]
+                writer.writerow([notebook, totals[row], *["" if p != p else p for p in points]])
+
+    def summary(self, bins: int = 10) -> dict:
+        """
+        Get a summary of the results with the pass rates and the score histogram
+        """
+        totals, pass_rates = self.statistics()
+        return {
+            "submissions": len(self),
+            "pass_rates": {grade_id: None if rate != rate else rate for grade_id, rate in pass_rates.items()},
+            "histogram": self.histogram(bins=bins, totals=totals)
+        }
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import hashlib
+import random
+from dataclasses import dataclass
+from itertools import combinations
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple
+
+from .cells import NbgraderCellType
+from .gen.generator import AstNormalizer, NbgCodeGenerator
+
+if TYPE_CHECKING:
+    from .notebook import GraderNotebook, Submission
+
+# mersenne prime used for the universal hash functions of the MinHash permutations
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# nbgrader ClearSolutions defaults
+_BEGIN_SOLUTION = "BEGIN SOLUTION"
+_END_SOLUTION = "END SOLUTION"
+_CODE_STUB = ["# YOUR CODE HERE", "raise NotImplementedError()"]
+
+
+def release_answer(sourcecode: str) -> str:
+    """
+    Get the released scaffold of an answer cell as nbgrader assign does
+    i.e. each BEGIN SOLUTION/END SOLUTION region is replaced by the code stub with the indentation of the region
+    answers without a solution region (e.g. of a released notebook) are returned unchanged
+    """
+    if _BEGIN_SOLUTION not in sourcecode:
+        return sourcecode
+    lines = []
+    in_solution = False
+    for line in sourcecode.split("\n"):
+        if _BEGIN_SOLUTION in line:
+            in_solution = True
+            indent = line[:len(line) - len(line.lstrip())]
+            lines.extend(f"{indent}{stub}" for stub in _CODE_STUB)
+        elif _END_SOLUTION in line:
+            in_solution = False
+        elif not in_solution:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+@dataclass
+class SimilarPair:
+    """
+    pair of submissions with similar answers
+    """
+    first: str
+    second: str
+    similarity: float
+
+
+class SimilarityIndex:
+    """
+    near-duplicate detection of submission answers
+    the AUTOGRADED_ANSWER cells of each submission are reduced to normalized AST shingles,
+    summarized as MinHash signatures and hashed into locality-sensitive hashing buckets
+    so that candidate pairs are found without comparing every pair of submissions
+    the released scaffold of each answer is subtracted so that untouched answers do not pair with each other
+    """
+
+    def __init__(
+            self,
+            num_perm: int = 64,
+            bands: int = 16,
+            shingle_size: int = 5,
+            threshold: float = 0.8,
+            min_shingles: int = 5,
+            seed: int = 1,
+            template_notebook: Optional[GraderNotebook] = None
+    ):
+        """
+        constructor
+        Args:
+            num_perm: number of MinHash permutations - must be a multiple of bands
+            bands: number of LSH bands - more bands find pairs with lower similarity
+            shingle_size: number of consecutive AST tokens per shingle
+            threshold: minimum estimated similarity of reported pairs
+            min_shingles: submissions with fewer shingles (e.g. unanswered) are ignored
+            seed: seed of the hash permutations
+            template_notebook: release or source notebook with the scaffold of the answers - see add_template
+        """
+        if num_perm % bands != 0:
+            raise ValueError(f"num_perm {num_perm} must be a multiple of bands {bands}")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.min_shingles = min_shingles
+        rand = random.Random(seed)
+        self._permutations = [
+            (rand.randint(1, _MERSENNE_PRIME - 1), rand.randint(0, _MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+        self._generator = NbgCodeGenerator()
+        self.signatures: Dict[str, Tuple[int, ...]] = {}
+        self.buckets: Dict[Tuple[int, Tuple[int, ...]], List[str]] = {}
+        # grade_id -> (released sourcecode, shingles) of the answer cells
+        self.templates: Dict[str, Tuple[str, Set[int]]] = {}
+        if template_notebook is not None:
+            self.add_template(template_notebook)
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def shingles(self, sourcecodes: Iterable[str]) -> Set[int]:
+        """
+        Get the hashed shingles of the given sourcecodes
+        the normalized AST tokens are taken from the cached cell preprocessing of the generator
+        so that cells are parsed only once if the index is filled while generating with collect_tokens
+        """
+        shingles = set()
+        for sourcecode in sourcecodes:
+            tokens = self._generator.preprocess_cell(sourcecode, tokens=True).tokens
+            for i in range(max(len(tokens) - self.shingle_size + 1, 0)):
+                shingle = " ".join(tokens[i:i + self.shingle_size]).encode("utf-8")
+                shingles.add(int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), "little"))
+        return shingles
+
+    def _answer_cells(self, notebook: GraderNotebook) -> Iterable[Tuple[str, str]]:
+        """
+        Get the grade_id and sourcecode of the AUTOGRADED_ANSWER cells of the given notebook
+        """
+        for cell in notebook.cells:
+            if cell.cell_type != "code" or not cell.metadata:
+                continue
+            nbg_metadata = cell.get_nbg_metadata()
+            if nbg_metadata and nbg_metadata.get_type() is NbgraderCellType.AUTOGRADED_ANSWER:
+                yield nbg_metadata.grade_id, self._generator.get_cell_sourcecode(cell)
+
+    def add_template(self, notebook: GraderNotebook):
+        """
+        add the scaffold of the answer cells of the given release or source notebook
+        the solution regions of a source notebook are replaced by the code stub - see release_answer
+        Args:
+            notebook: release or source notebook of the assignment
+        """
+        for grade_id, sourcecode in self._answer_cells(notebook):
+            template = release_answer(sourcecode)
+            self.templates[grade_id] = (template.strip(), self.shingles([template]))
+
+    def signature(self, shingles: Set[int]) -> Tuple[int, ...]:
+        """
+        Get the MinHash signature of the given shingles
+        """
+        return tuple(
+            min(((a * shingle + b) % _MERSENNE_PRIME) & _MAX_HASH for shingle in shingles)
+            for a, b in self._permutations
+        )
+
+    def add(self, key: str, sourcecodes: Iterable[str]) -> Optional[Tuple[int, ...]]:
+        """
+        add the given answer sourcecodes under the given key
+        Args:
+            key: identifier of the submission
+            sourcecodes: answer sourcecodes of the submission
+
+        Returns:
+            the MinHash signature or None if the answer is too small to be compared
+        """
+        return self._add_shingles(key, self.shingles(sourcecodes))
+
+    def _add_shingles(self, key: str, shingles: Set[int]) -> Optional[Tuple[int, ...]]:
+        """
+        add the given shingles under the given key - see add
+        """
+        if len(shingles) < self.min_shingles:
+            return None
+        signature = self.signature(shingles)
+        self.signatures[key] = signature
+        for band in range(self.bands):
+            band_key = (band, signature[band * self.rows:(band + 1) * self.rows])
+            self.buckets.setdefault(band_key, []).append(key)
+        return signature
+
+    def add_submission(self, submission: "Submission") -> Optional[Tuple[int, ...]]:
+        """
+        add the AUTOGRADED_ANSWER cells of the given submission
+        answers identical to their template are skipped and the shingles of the template are subtracted
+        """
+        shingles = set()
+        for grade_id, sourcecode in self._answer_cells(submission):
+            template, template_shingles = self.templates.get(grade_id, (None, set()))
+            if sourcecode.strip() == template:
+                continue
+            shingles.update(self.shingles([sourcecode]) - template_shingles)
+        return self._add_shingles(str(submission.notebook_filepath), shingles)
+
+    def similarity(self, first: str, second: str) -> float:
+        """
+        Get the estimated Jaccard similarity of the given submissions
+        """
+        first_signature = self.signatures[first]
+        second_signature = self.signatures[second]
+        return sum(a == b for a, b in zip(first_signature, second_signature)) / self.num_perm
+
+    def candidate_pairs(self) -> List[SimilarPair]:
+        """
+        Get the pairs of submissions sharing at least one LSH bucket with an
+        estimated similarity above the threshold
+
+        Returns:
+            list: similar pairs - most similar first
+        """
+        candidates = set()
+        for keys in self.buckets.values():
+            if len(keys) > 1:
+                candidates.update(combinations(sorted(keys), 2))
+        pairs = []
+        for first, second in candidates:
+            similarity = self.similarity(first, second)
+            if similarity >= self.threshold:
+                pairs.append(SimilarPair(first=first, second=second, similarity=similarity))
+        pairs.sort(key=lambda pair: (-pair.similarity, pair.first, pair.second))
+        return pairs
@@ -0,0 +1,253 @@
+import io
+import tarfile
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import IO, Iterator, Optional, Union
+
+from . import logger
+
+NOTEBOOK_SUFFIX = ".ipynb"
+ZIP_SUFFIXES = (".zip",)
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+GROUP_SUFFIX = "_assignsubmission_file"
+
+
+@dataclass
+class SubmissionFile:
+    """
+    a submission notebook read from a submission source
+    """
+    name: str
+    content: bytes
+
+    @property
+    def group(self) -> str:
+        """
+        Get the student/group the submission belongs to
+        e.g. "Group 1_122542_assignsubmission_file" for LMS exports
+
+        Returns:
+            str: first path component ending with the assignsubmission suffix,
+                 the top level directory otherwise
+        """
+        return group_of(self.name)
+
+    def as_file(self) -> io.BytesIO:
+        """
+        Get the content as named in memory file as expected by GraderNotebook
+        """
+        notebook_file = io.BytesIO(self.content)
+        notebook_file.name = self.name
+        return notebook_file
+
+
+def group_of(name: str) -> str:
+    """
+    Get the group of the given submission member name
+    Args:
+        name: member name of the submission notebook
+
+    Returns:
+        str: group name
+    """
+    parts = PurePosixPath(name).parts
+    for part in parts[:-1]:
+        if part.endswith(GROUP_SUFFIX):
+            return part
+    return parts[0] if len(parts) > 1 else ""
+
+
+def is_notebook(name: str) -> bool:
+    """
+    check if the given member name is a notebook (and not a checkpoint or macOS resource fork)
+    """
+    path = PurePosixPath(name)
+    if not path.name.endswith(NOTEBOOK_SUFFIX) or path.name.startswith("._"):
+        return False
+    return not any(part in (".ipynb_checkpoints", "__MACOSX") for part in path.parts)
+
+
+def archive_suffix(name: str) -> Optional[str]:
+    """
+    Get the archive suffix of the given name
+
+    Returns:
+        str: the matching zip or tar suffix
+        None: if the name is not an archive
+    """
+    lower_name = name.lower()
+    for suffix in ZIP_SUFFIXES + TAR_SUFFIXES:
+        if lower_name.endswith(suffix):
+            return suffix
+    return None
+
+
+def normalize_group(group: str) -> str:
+    """
+    normalize the given group name so that "Group_17" matches "Group 17_122558_assignsubmission_file"
+    """
+    return group.replace(" ", "_").lower()
+
+
+def matches_group(group: str, selector: str) -> bool:
+    """
+    check if the given group matches the given selector
+    Args:
+        group: group name e.g. "Group 17_122558_assignsubmission_file"
+        selector: full group name or its prefix up to an underscore e.g. "Group_17"
+    """
+    group = normalize_group(group)
+    selector = normalize_group(selector)
+    return group == selector or group.startswith(f"{selector}_")
+
+
+def nested_prefix(prefix: str, member_name: str) -> str:
+    """
+    Get the name prefix for the members of a nested archive
+    the archive suffix is stripped so that a per-student "Group_1_assignsubmission_file.zip"
+    yields the same member names as the unpacked directory
+    """
+    suffix = archive_suffix(member_name)
+    stripped = member_name[:-len(suffix)] if suffix else member_name
+    return f"{prefix}{stripped}/"
+
+
+class SubmissionSource:
+    """
+    streams submission notebooks from a location without extracting them to disk
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        constructor
+        Args:
+            path: location of the submissions
+        """
+        self.path = Path(path).expanduser()
+
+    def __iter__(self) -> Iterator[SubmissionFile]:
+        return self.iter_notebooks()
+
+    def iter_notebooks(self) -> Iterator[SubmissionFile]:
+        """
+        iterate over the submission notebooks of this source
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def for_path(cls, path: Union[str, Path]) -> "SubmissionSource":
+        """
+        Get the submission source matching the given location
+        Args:
+            path: directory, zip or tar file
+
+        Returns:
+            SubmissionSource
+        """
+        path = Path(path).expanduser()
+        if path.is_dir():
+            return DirectorySource(path)
+        if not path.is_file():
+            raise Exception(f"{path} is not a file or directory")
+        if zipfile.is_zipfile(path):
+            return ZipSource(path)
+        if tarfile.is_tarfile(path):
+            return TarSource(path)
+        raise Exception(f"{path} is not a supported submission source")
+
+    @classmethod
+    def iter_archive(cls, fileobj: IO[bytes], name: str, prefix: str = "") -> Iterator[SubmissionFile]:
+        """
+        iterate over the notebooks of the given (possibly nested) archive file object
+        Args:
+            fileobj: seekable binary file object of the archive
+            name: name of the archive used to detect the archive type
+            prefix: prefix for the member names
+        """
+        if zipfile.is_zipfile(fileobj):
+            fileobj.seek(0)
+            with zipfile.ZipFile(fileobj) as archive:
+                yield from cls.iter_zip(archive, prefix)
+        else:
+            fileobj.seek(0)
+            with tarfile.open(fileobj=fileobj, mode="r:*") as archive:
+                yield from cls.iter_tar(archive, prefix)
+
+    @classmethod
+    def iter_zip(cls, archive: zipfile.ZipFile, prefix: str = "") -> Iterator[SubmissionFile]:
+        """
+        iterate over the notebooks of the given zip archive and its nested archives
+        """
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            if is_notebook(info.filename):
+                yield SubmissionFile(f"{prefix}{info.filename}", archive.read(info))
+            elif archive_suffix(info.filename):
+                with archive.open(info) as member:
+                    yield from cls._iter_nested(member, info.filename, prefix)
+
+    @classmethod
+    def iter_tar(cls, archive: tarfile.TarFile, prefix: str = "") -> Iterator[SubmissionFile]:
+        """
+        iterate over the notebooks of the given tar archive and its nested archives
+        """
+        for info in archive:
+            if not info.isfile():
+                continue
+            if is_notebook(info.name):
+                member = archive.extractfile(info)
+                yield SubmissionFile(f"{prefix}{PurePosixPath(info.name).as_posix()}", member.read())
+            elif archive_suffix(info.name):
+                member = archive.extractfile(info)
+                yield from cls._iter_nested(member, PurePosixPath(info.name).as_posix(), prefix)
+
+    @classmethod
+    def _iter_nested(cls, member: IO[bytes], member_name: str, prefix: str) -> Iterator[SubmissionFile]:
+        """
+        iterate over a nested archive member - non seekable members are buffered in memory
+        """
+        if not member.seekable():
+            member = io.BytesIO(member.read())
+        try:
+            yield from cls.iter_archive(member, member_name, nested_prefix(prefix, member_name))
+        except (zipfile.BadZipFile, tarfile.TarError) as ex:
+            logger.error(f"{prefix}{member_name}: could not read nested archive: {ex}")
+
+
+class DirectorySource(SubmissionSource):
+    """
+    submission notebooks and archives in a directory tree
+    """
+
+    def iter_notebooks(self) -> Iterator[SubmissionFile]:
+        for file_path in sorted(self.path.rglob("*")):
+            if not file_path.is_file():
+                continue
+            name = file_path.relative_to(self.path).as_posix()
+            if is_notebook(name):
+                yield SubmissionFile(name, file_path.read_bytes())
+            elif archive_suffix(name):
+                with open(file_path, mode="rb") as fileobj:
+                    yield from self._iter_nested(fileobj, name, "")
+
+
+class ZipSource(SubmissionSource):
+    """
+    submission notebooks in a zip file including nested zip and tar archives
+    """
+
+    def iter_notebooks(self) -> Iterator[SubmissionFile]:
+        with zipfile.ZipFile(self.path, "r") as archive:
+            yield from self.iter_zip(archive)
+
+
+class TarSource(SubmissionSource):
+    """
+    submission notebooks in a (compressed) tar file including nested zip and tar archives
+    """
+
+    def iter_notebooks(self) -> Iterator[SubmissionFile]:
+        with tarfile.open(self.path, mode="r:*") as archive:
+            yield from self.iter_tar(archive)
@@ -0,0 +1,234 @@
+import hashlib
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from . import logger
+from .gen.generator import NbgCodeGenerator
+from .notebook import GraderNotebook, Submission
+from .progress import ProgressTracker
+from .sources import SubmissionFile, SubmissionSource, archive_suffix, is_notebook
+
+
+class SubmissionWatcher:
+    """
+    watches a drop directory and generates (and optionally grades) newly arrived or changed submissions
+    the source notebook and the generator are kept in memory between the scans
+    """
+
+    def __init__(
+            self,
+            directory: Union[str, Path],
+            source_notebook: GraderNotebook,
+            output_folder: Union[str, Path],
+            template_filepath: Optional[str] = None,
+            only_merge_answers: bool = False,
+            with_cell_comments: bool = False,
+            interval: float = 2.0,
+            grade: bool = False,
+            grade_timeout: Optional[float] = 60,
+            runtime: str = "import",
+            policy: str = "run_all",
+            max_errors: Optional[int] = None,
+            status_file: Optional[Union[str, Path]] = None,
+            debug: bool = False
+    ):
+        """
+        constructor
+        Args:
+            directory: drop directory to watch
+            source_notebook: source notebook of the submissions
+            output_folder: target directory to store the generated files
+            template_filepath: template to use. If None NotebookContext is used
+            only_merge_answers: see Submission.merge_code
+            with_cell_comments: if true add jupyter cell metadata as python comments
+            interval: polling interval in seconds
+            grade: if True run each generated file - the results are appended to results.json in the output folder
+            grade_timeout: timeout in seconds for grading a single submission
+            runtime: how the generated files get the NotebookContext - see NbgCodeGenerator
+            policy: execution policy of the generated files - see NotebookContext
+            max_errors: maximum number of failing cells of the generated files - see NotebookContext
+            status_file: If set the progress status is flushed to this JSON file
+            debug: if True show debug info
+        """
+        self.directory = Path(directory).expanduser()
+        self.source_notebook = source_notebook
+        self.output_folder = Path(output_folder).expanduser()
+        self.template_filepath = template_filepath
+        self.only_merge_answers = only_merge_answers
+        self.with_cell_comments = with_cell_comments
+        self.interval = interval
+        self.grade = grade
+        self.grade_timeout = grade_timeout
+        self.debug = debug
+        self.generator = NbgCodeGenerator(runtime=runtime, policy=policy, max_errors=max_errors)
+        # file path → (mtime_ns, size) of the last scan
+        self._file_stats: Dict[Path, Tuple[int, int]] = {}
+        # submission name → content hash of the last generated version
+        self._content_hashes: Dict[str, str] = {}
+        self._wakeup = threading.Event()
+        self.progress = ProgressTracker(name=f"watch {self.directory}", status_file=status_file)
+
+    def changed_files(self) -> Iterator[SubmissionFile]:
+        """
+        iterate over the submission notebooks that are new or changed since the last scan
+        only files with a new modification time or size are read
+        """
+        for file_path in sorted(self.directory.rglob("*")):
+            if not file_path.is_file():
+                continue
+            name = file_path.relative_to(self.directory).as_posix()
+            if not is_notebook(name) and not archive_suffix(name):
+                continue
+            stat = file_path.stat()
+            file_stat = (stat.st_mtime_ns, stat.st_size)
+            if self._file_stats.get(file_path) == file_stat:
+                continue
+            self._file_stats[file_path] = file_stat
+            try:
+                if is_notebook(name):
+                    submission_files = [SubmissionFile(name, file_path.read_bytes())]
+                else:
+                    with open(file_path, mode="rb") as fileobj:
+                        submission_files = list(SubmissionSource._iter_nested(fileobj, name, ""))
+            except OSError as ex:
+                # file is probably still being written - retry with the next scan
+                logger.debug(f"{file_path}: {ex}")
+                self._file_stats.pop(file_path, None)
+                continue
+            for submission_file in submission_files:
+                content_hash = hashlib.sha256(submission_file.content).hexdigest()
+                if self._content_hashes.get(submission_file.name) != content_hash:
+                    self._content_hashes[submission_file.name] = content_hash
+                    yield submission_file
+
+    def process(self, submission_file: SubmissionFile) -> Optional[Path]:
+        """
+        generate (and grade) the given submission
+        Args:
+            submission_file: submission to process
+
+        Returns:
+            Path: location of the generated file
+            None: if the submission could not be processed
+        """
+        submission = Submission(submission_file.as_file(), debug=self.debug)
+        if not submission.loaded:
+            return None
+        with self.progress.item(submission_file.name):
+            with self.progress.stage("merge"):
+                merged_notebook = submission.merge_code(self.source_notebook, only_merge_answers=self.only_merge_answers)
+            file_path = self.output_folder.joinpath(self.generator.get_file_name(merged_notebook))
+            with self.progress.stage("generate"):
+                if self.template_filepath is None:
+                    self.generator.generate_file(merged_notebook, target=self.output_folder)
+                else:
+                    py_code = merged_notebook.as_python_code(self.template_filepath, with_cell_comments=self.with_cell_comments)
+                    file_path.parent.mkdir(parents=True, exist_ok=True)
+                    with open(file_path, mode="w", encoding="utf8") as f:
+                        f.write(py_code)
+            logger.info(f"Generated {file_path}")
+            if self.grade:
+                with self.progress.stage("grade"):
+                    self.grade_file(file_path)
+        return file_path
+
+    def grade_file(self, file_path: Path) -> Optional[int]:
+        """
+        run the given generated file in a separate process
+        Args:
+            file_path: generated python file
+
+        Returns:
+            int: exit code of the run
+            None: if the run timed out
+        """
+        try:
+            completed = subprocess.run(
+                    [sys.executable, str(file_path), "--hide_cell_output", "--suppress_exception"],
+                    cwd=self.output_folder,
+                    capture_output=not self.debug,
+                    timeout=self.grade_timeout
+            )
+        except subprocess.TimeoutExpired:
+            logger.error(f"Grading {file_path} timed out after {self.grade_timeout}s")
+            return None
+        if completed.returncode != 0:
+            logger.error(f"Grading {file_path} failed with exit code {completed.returncode}")
+        return completed.returncode
+
+    def scan(self) -> List[Path]:
+        """
+        process all new or changed submissions
+
+        Returns:
+            list: locations of the generated files
+        """
+        generated = []
+        for submission_file in self.changed_files():
+            try:
+                file_path = self.process(submission_file)
+            except Exception as ex:
+                logger.error(f"{submission_file.name}:{repr(ex)}")
+                continue
+            if file_path is not None:
+                generated.append(file_path)
+        self.progress.flush(force=bool(generated))
+        return generated
+
+    def notify(self):
+        """
+        trigger an immediate scan
+        """
+        self._wakeup.set()
+
+    def _start_observer(self):
+        """
+        start a file system observer if watchdog is installed
+
+        Returns:
+            the observer or None if the polling fallback is used
+        """
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            logger.info(f"watchdog is not installed → polling {self.directory} every {self.interval}s")
+            return None
+        watcher = self
+
+        class WakeupHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                watcher.notify()
+
+        observer = Observer()
+        observer.schedule(WakeupHandler(), str(self.directory), recursive=True)
+        observer.start()
+        return observer
+
+    def run(self, max_scans: Optional[int] = None):
+        """
+        watch the directory until interrupted
+        Args:
+            max_scans: stop after the given number of scans - None: run forever
+        """
+        observer = self._start_observer()
+        scans = 0
+        try:
+            while max_scans is None or scans < max_scans:
+                self._wakeup.clear()
+                self.scan()
+                scans += 1
+                if max_scans is not None and scans >= max_scans:
+                    break
+                self._wakeup.wait(self.interval)
+                if observer is not None:
+                    # let a burst of events settle
+                    time.sleep(min(0.2, self.interval))
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
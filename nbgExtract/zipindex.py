@@ -0,0 +1,189 @@
+import io
+import json
+import mmap
+import struct
+import zipfile
+import zlib
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from . import logger
+from .sources import SubmissionFile, SubmissionSource, archive_suffix, group_of, is_notebook, matches_group, nested_prefix
+
+INDEX_VERSION = 1
+# local file header: signature, version, flags, compression, time, date, crc, sizes, name length, extra length
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+
+
+@dataclass
+class ZipIndexEntry:
+    """
+    location of a submission member in a zip archive
+    """
+    name: str
+    group: str
+    header_offset: int
+    compress_type: int
+    compress_size: int
+    file_size: int
+    crc: int
+
+    @property
+    def content_hash(self) -> str:
+        """
+        content hash of the member taken from the central directory (crc32 and size)
+        """
+        return f"{self.crc:08x}-{self.file_size}"
+
+
+class ZipIndex:
+    """
+    persistent index of the submission members of a zip archive
+    maps student/group → member offset and content hash so that single submissions can be read
+    via mmap without parsing the central directory or touching the other members
+    the index is stored next to the archive as <archive>.index.json
+    """
+
+    def __init__(self, zip_path: Union[str, Path], entries: Optional[List[ZipIndexEntry]] = None):
+        """
+        constructor
+        Args:
+            zip_path: location of the zip archive
+            entries: indexed members
+        """
+        self.zip_path = Path(zip_path).expanduser()
+        self.entries: List[ZipIndexEntry] = entries if entries is not None else []
+        self._groups: Dict[str, List[ZipIndexEntry]] = {}
+        for entry in self.entries:
+            self._groups.setdefault(entry.group, []).append(entry)
+
+    @property
+    def index_path(self) -> Path:
+        return self.zip_path.with_name(f"{self.zip_path.name}.index.json")
+
+    def _archive_stat(self) -> dict:
+        stat = self.zip_path.stat()
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    @classmethod
+    def build(cls, zip_path: Union[str, Path]) -> "ZipIndex":
+        """
+        build the index from the central directory of the given archive
+        notebooks and nested archives (e.g. per student zips) are indexed
+        """
+        entries = []
+        with zipfile.ZipFile(zip_path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not (is_notebook(info.filename) or archive_suffix(info.filename)):
+                    continue
+                name = info.filename
+                if archive_suffix(name):
+                    group = group_of(f"{nested_prefix('', name)}member")
+                else:
+                    group = group_of(name)
+                entries.append(ZipIndexEntry(
+                        name=name,
+                        group=group,
+                        header_offset=info.header_offset,
+                        compress_type=info.compress_type,
+                        compress_size=info.compress_size,
+                        file_size=info.file_size,
+                        crc=info.CRC
+                ))
+        return cls(zip_path, entries)
+
+    def save(self):
+        """
+        store the index next to the archive
+        """
+        record = {
+            "version": INDEX_VERSION,
+            "archive": self._archive_stat(),
+            "entries": [asdict(entry) for entry in self.entries]
+        }
+        with open(self.index_path, mode="w", encoding="utf8") as fp:
+            json.dump(record, fp)
+
+    @classmethod
+    def load(cls, zip_path: Union[str, Path], save: bool = True) -> "ZipIndex":
+        """
+        load the stored index of the given archive - the index is rebuilt if it is missing or outdated
+        Args:
+            zip_path: location of the zip archive
+            save: If True store a rebuilt index
+        """
+        index = cls(zip_path)
+        try:
+            with open(index.index_path, encoding="utf8") as fp:
+                record = json.load(fp)
+            if record.get("version") == INDEX_VERSION and record.get("archive") == index._archive_stat():
+                return cls(zip_path, [ZipIndexEntry(**entry) for entry in record["entries"]])
+        except (OSError, ValueError, TypeError, KeyError):
+            pass
+        index = cls.build(zip_path)
+        if save:
+            try:
+                index.save()
+            except OSError as ex:
+                logger.info(f"could not store zip index {index.index_path}: {ex}")
+        return index
+
+    def groups(self) -> List[str]:
+        """
+        Get the indexed groups
+        """
+        return list(self._groups.keys())
+
+    def select(self, selectors: Iterable[str]) -> List[ZipIndexEntry]:
+        """
+        Get the entries of the groups matching the given selectors e.g. ["Group_17"]
+        """
+        selectors = list(selectors)
+        return [
+            entry
+            for group, entries in self._groups.items()
+            if any(matches_group(group, selector) for selector in selectors)
+            for entry in entries
+        ]
+
+    def read(self, entry: ZipIndexEntry, archive_map: Optional[mmap.mmap] = None) -> bytes:
+        """
+        read the content of the given entry via its local file header
+        Args:
+            entry: entry to read
+            archive_map: memory map of the archive - if None the archive is mapped for this read only
+        """
+        if archive_map is None:
+            with open(self.zip_path, mode="rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as archive_map:
+                return self.read(entry, archive_map)
+        header = _LOCAL_HEADER.unpack_from(archive_map, entry.header_offset)
+        if header[0] != _LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile(f"{self.zip_path}: invalid local header for {entry.name} - rebuild the index")
+        name_length, extra_length = header[9], header[10]
+        data_offset = entry.header_offset + _LOCAL_HEADER.size + name_length + extra_length
+        data = archive_map[data_offset:data_offset + entry.compress_size]
+        if entry.compress_type == zipfile.ZIP_STORED:
+            content = bytes(data)
+        elif entry.compress_type == zipfile.ZIP_DEFLATED:
+            content = zlib.decompress(data, -zlib.MAX_WBITS)
+        else:
+            # other compressions are rare in LMS exports - fall back to zipfile
+            with zipfile.ZipFile(self.zip_path) as archive:
+                content = archive.read(entry.name)
+        if zlib.crc32(content) != entry.crc:
+            raise zipfile.BadZipFile(f"{self.zip_path}: bad CRC for {entry.name} - rebuild the index")
+        return content
+
+    def iter_notebooks(self, entries: Iterable[ZipIndexEntry]) -> Iterator[SubmissionFile]:
+        """
+        iterate over the notebooks of the given entries - nested archives are expanded in memory
+        """
+        with open(self.zip_path, mode="rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as archive_map:
+            for entry in entries:
+                content = self.read(entry, archive_map)
+                if is_notebook(entry.name):
+                    yield SubmissionFile(entry.name, content)
+                else:
+                    yield from SubmissionSource._iter_nested(io.BytesIO(content), entry.name, "")
@@ -3,8 +3,13 @@ import tempfile
 import unittest
 from pathlib import Path
 import io
+import subprocess
+import sys
 from runpy import run_path
 
+from nbgExtract.cells import NbgraderCellMetadata
+from nbgExtract.executor import execute_code
+from nbgExtract.gen.context import NotebookContext
 from nbgExtract.gen.generator import NbgCodeGenerator
 from nbgExtract.notebook import GraderNotebook, Submissions
 
@@ -34,10 +39,196 @@ class TestNbgCodeGenerator(unittest.TestCase):
             f = io.StringIO()
             with contextlib.redirect_stdout(f):
                 x = run_path(expected_file)
-                x.get("main")()
+                x.get("main")(["test"])
             output = f.getvalue()
             self.assertIn("[NbgCellTestResult(grade_id='cell-744e5dbe470759ae', max_points=1, points=1.0)]", output)
 
+    def test_runtimes(self):
+        """
+        test generated files that run without the nbgExtract package
+        """
+        source_file = f"{self.resource_dir}/python_addition/python_addition_source.ipynb"
+        zip_file = f"{self.resource_dir}/python_addition/submissions.zip"
+        submissions = Submissions.from_zip(zip_file)
+        submissions.source_notebook = GraderNotebook(source_file)
+        for runtime in ["inline", "sibling"]:
+            with self.subTest(runtime=runtime), tempfile.TemporaryDirectory() as target:
+                submissions.generate_python_files(target, runtime=runtime)
+                expected_file = Path(target).joinpath(
+                        "test_Group_1_122542_assignsubmission_file",
+                        "python_addition_correct_submission.py"
+                )
+                code = expected_file.read_text()
+                self.assertNotIn("nbgExtract", code)
+                self.assertEqual(runtime == "sibling", Path(target).joinpath("nbg_runtime.py").is_file())
+                # -I isolates the run from the installed package and the current directory
+                completed = subprocess.run(
+                        [sys.executable, "-I", str(expected_file), "--hide_cell_output"],
+                        cwd=target, capture_output=True, text=True
+                )
+                self.assertEqual(0, completed.returncode, completed.stderr)
+                self.assertIn("max_points=1, points=1.0)]", completed.stdout)
+
+    def test_separate_imports(self):
+        """
+        test the line range based removal of module level imports by the cell preprocessing
+        """
+        test_params = [
+            ("import os\nx = 1\n", "#import os\nx = 1\n", ["import os"]),
+            ("import os; x = 1", "pass; x = 1", ["import os"]),
+            ("from a import (b,\n  c)\nimport_b = 1", "#from a import (b,\n#  c)\nimport_b = 1", ["from a import (b,\n  c)"]),
+            ("def f():\n    import sys\n", "def f():\n    import sys\n", []),
+            ('s = "a\x0cb"\nimport os\n', 's = "a\x0cb"\n#import os\n', ["import os"]),
+            ("x = 1\rimport os\r\ny = 2", "x = 1\r#import os\r\ny = 2", ["import os"]),
+        ]
+        generator = NbgCodeGenerator()
+        for sourcecode, expected_sourcecode, expected_imports in test_params:
+            with self.subTest(sourcecode=sourcecode):
+                preprocessed = generator.preprocess_cell(sourcecode)
+                self.assertEqual(expected_sourcecode, preprocessed.sourcecode)
+                self.assertEqual(tuple(expected_imports), preprocessed.imports)
+                self.assertEqual((expected_sourcecode, expected_imports), generator.separate_imports(sourcecode))
+        imports = ["import os", "from __future__ import annotations", "import sys", "import os"]
+        expected = ["from __future__ import annotations", "import os", "import sys"]
+        self.assertEqual(expected, generator.hoist_imports(imports))
+
+    def test_execution_policies(self):
+        """
+        test skipping cells that depend on failed cells and stopping after max errors
+        """
+        test_cell = {"id": "test", "metadata": {"nbgrader": {"grade": True, "grade_id": "test", "points": 1}}}
+        test_params = [
+            ("skip_dependents", None, 1),
+            ("run_all", 1, 2),
+        ]
+        for policy, max_errors, expected_skipped in test_params:
+            with self.subTest(policy=policy, max_errors=max_errors):
+                notebook_context = NotebookContext(name="test", show_output=False, policy=policy, max_errors=max_errors)
+                executed = []
+                with notebook_context(cell_metadata=None, defines=("z",), uses=()) as run_cell:
+                    if run_cell:
+                        raise NotImplementedError()
+                with notebook_context(cell_metadata=None, defines=("y",), uses=()) as run_cell:
+                    if run_cell:
+                        executed.append("independent")
+                with notebook_context(cell_metadata=test_cell, defines=(), uses=("z",)) as run_cell:
+                    if run_cell:
+                        executed.append("test")
+                self.assertEqual(expected_skipped, notebook_context.skipped)
+                self.assertEqual(["independent"][:2 - expected_skipped], executed)
+                self.assertEqual(1, len(notebook_context.errors))
+                self.assertEqual([0.0], [test.points for test in notebook_context.tests])
+
+    def test_failed_names(self):
+        """
+        test that failing assertions neither mark names as failed nor count as errors
+        and that redefined names are no longer failed
+        """
+        test_cell = {"id": "test", "metadata": {"nbgrader": {"grade": True, "grade_id": "test", "points": 1}}}
+        notebook_context = NotebookContext(name="test", show_output=False, policy="skip_dependents", max_errors=1)
+        with notebook_context(cell_metadata=test_cell, defines=("result",), uses=()) as run_cell:
+            if run_cell:
+                assert False
+        with notebook_context(cell_metadata=None, defines=("z",), uses=()) as run_cell:
+            if run_cell:
+                raise NotImplementedError()
+        self.assertEqual({"z"}, notebook_context.failed_names)
+        self.assertEqual((1, 1), (len(notebook_context.failed_asserts), len(notebook_context.errors)))
+        notebook_context.max_errors = None
+        with notebook_context(cell_metadata=None, defines=("z",), uses=()) as run_cell:
+            self.assertTrue(run_cell)
+        self.assertEqual(set(), notebook_context.failed_names)
+
+    def test_shared_test_variables(self):
+        """
+        test that test cells sharing a temporary variable are graded independently with skip_dependents
+        """
+        def cell(cell_id: str, source: str, grade: bool, solution: bool) -> dict:
+            nbgrader = {"schema_version": 3, "grade": grade, "grade_id": cell_id, "solution": solution, "locked": not solution, "points": 1}
+            return {"cell_type": "code", "id": cell_id, "metadata": {"nbgrader": nbgrader}, "source": source.splitlines(keepends=True)}
+        notebook = GraderNotebook({"cells": [
+            cell("answer", "def add(a, b):\n    return a + b\n", grade=False, solution=True),
+            cell("test-1", "result = add(1, 1)\nassert result == 3\n", grade=True, solution=False),
+            cell("test-2", "result = add(1, 2)\nassert result == 3\n", grade=True, solution=False),
+            cell("test-3", "assert result == 3\n", grade=True, solution=False),
+        ]}, name="shared")
+        code = NbgCodeGenerator(policy="skip_dependents").generate(notebook)
+        self.assertEqual([0.0, 1.0, 1.0], [test.points for test in execute_code(code)])
+        self.assertNotIn("defines=", NbgCodeGenerator().generate(notebook))
+
+    def test_cell_names(self):
+        """
+        test the names a cell defines and reads before assigning them
+        """
+        test_params = [
+            ("result = f(1)\nassert result == 2", ("result",), ("f",)),
+            ("x += 1", ("x",), ("x",)),
+            ("def g(a):\n    b = a + c\n    return b\nc = 1", ("c", "g"), ()),
+            ("y = [i for i in range(n)]", ("y",), ("n", "range")),
+            ("f = lambda t: t + u", ("f",), ("u",)),
+            ("def h():\n    global G\n    G = 1\n", ("G", "h"), ()),
+            ("import os\nos.sep", (), ("os",)),
+        ]
+        generator = NbgCodeGenerator()
+        for sourcecode, expected_defines, expected_uses in test_params:
+            with self.subTest(sourcecode=sourcecode):
+                preprocessed = generator.preprocess_cell(sourcecode, names=True)
+                self.assertEqual((expected_defines, expected_uses), (preprocessed.defines, preprocessed.uses))
+
+    def test_add_score_record(self):
+        """
+        test that the score expression of a test cell is passed to the notebook context
+        """
+        metadata = NbgraderCellMetadata(schema_version=3, grade=True, grade_id="test", solution=False, locked=True, points=2)
+        test_params = [
+            ("assert True", "assert True\nnotebook_context.record_score(2)"),
+            ("x = 1\nx + 1\n", "x = 1\nnotebook_context.record_score(x + 1)\n"),
+            ("x = 1; (x +\n 1)", "x = 1; notebook_context.record_score((x +\n 1))"),
+            ('s = "a\x0cb"\nx = 1\n5\n', 's = "a\x0cb"\nx = 1\nnotebook_context.record_score(5)\n'),
+        ]
+        generator = NbgCodeGenerator()
+        for sourcecode, expected in test_params:
+            with self.subTest(sourcecode=sourcecode):
+                self.assertEqual(expected, generator.preprocess_cell(sourcecode, metadata).sourcecode)
+        notebook_context = NotebookContext(name="test", show_output=False)
+        cell_metadata = {"cell_type": "code", "metadata": {"nbgrader": metadata.__dict__}}
+        with notebook_context(cell_metadata=cell_metadata):
+            notebook_context.record_score(1.5)
+            print("output after the score")
+        self.assertEqual(1.5, notebook_context.tests[0].points)
+
+    def test_record_score_points(self):
+        """
+        test that non-numeric scores receive the full points and numeric scores are capped as in nbgrader
+        """
+        metadata = {"nbgrader": {"grade": True, "grade_id": "test", "solution": False, "locked": True, "points": 2}}
+        test_params = [(True, 2.0), (None, 2.0), ("1", 2.0), (1, 1.0), (0.5, 0.5), (3, 2.0)]
+        for score, expected in test_params:
+            with self.subTest(score=score):
+                notebook_context = NotebookContext(name="test", show_output=False)
+                with notebook_context(cell_metadata={"cell_type": "code", "metadata": metadata}):
+                    notebook_context.record_score(score)
+                self.assertEqual([expected], [test.points for test in notebook_context.tests])
+
+    def test_parallel_preprocessing(self):
+        """
+        test that cells preprocessed in the worker pool give the same code as serial preprocessing
+        and that the cells of the merged notebook are not modified
+        """
+        source_file = f"{self.resource_dir}/python_addition/python_addition_source.ipynb"
+        zip_file = f"{self.resource_dir}/python_addition/submissions.zip"
+        submissions = Submissions.from_zip(zip_file)
+        source_notebook = GraderNotebook(source_file)
+        merged_notebook = submissions.submissions[0].merge_code(source_notebook)
+        cell_sources = [cell.source for cell in merged_notebook.cells]
+        serial_code = NbgCodeGenerator().generate(merged_notebook)
+        self.assertEqual(serial_code, NbgCodeGenerator().generate(merged_notebook))
+        self.assertEqual(cell_sources, [cell.source for cell in merged_notebook.cells])
+        with NbgCodeGenerator(cell_workers=2, parallel_threshold=0) as generator:
+            self.assertEqual(serial_code, generator.generate(merged_notebook))
+            self.assertIsNotNone(generator._executor)
+        self.assertIsNone(generator._executor)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,54 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from nbgExtract.batch import BatchRunner
+
+
+class TestBatchRunner(unittest.TestCase):
+    """
+    test BatchRunner
+    """
+
+    def setUp(self) -> None:
+        """
+        setup test env
+        """
+        self.assignment_dir = Path(__file__).parent.absolute().joinpath("resources", "python_addition")
+
+    def test_manifest(self):
+        """
+        tests running multiple assignments of a manifest over a shared pool
+        """
+        for max_workers in [0, 2]:
+            with self.subTest(max_workers=max_workers), tempfile.TemporaryDirectory() as tmpdirname:
+                tmpdir = Path(tmpdirname)
+                manifest = [
+                    {
+                        "source": str(self.assignment_dir.joinpath("python_addition_source.ipynb")),
+                        "submission_zip": str(self.assignment_dir.joinpath("submissions.zip")),
+                        "output_folder": f"output_{i}"
+                    }
+                    for i in range(2)
+                ]
+                manifest_path = tmpdir.joinpath("manifest.json")
+                manifest_path.write_text(json.dumps(manifest))
+                status_file = tmpdir.joinpath("status.json")
+                runner = BatchRunner.from_manifest(manifest_path, max_workers=max_workers, status_file=str(status_file))
+                results = runner.run()
+                status = json.loads(status_file.read_text())
+                self.assertEqual((4, 4), (status["done"], status["total"]))
+                self.assertEqual([None, None], [result.error for result in results])
+                self.assertEqual([2, 2], [result.submissions for result in results])
+                for i in range(2):
+                    expected_file = tmpdir.joinpath(
+                            f"output_{i}",
+                            "test_Group_1_122542_assignsubmission_file",
+                            "python_addition_correct_submission.py"
+                    )
+                    self.assertTrue(expected_file.is_file())
+
+
+if __name__ == '__main__':
+    unittest.main()
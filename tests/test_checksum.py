@@ -0,0 +1,50 @@
+import json
+import unittest
+from pathlib import Path
+
+from nbgExtract.checksum import ChecksumVerifier
+from nbgExtract.notebook import GraderNotebook, Submission, Submissions
+
+
+class TestChecksumVerifier(unittest.TestCase):
+    """
+    test ChecksumVerifier
+    """
+
+    def setUp(self) -> None:
+        """
+        setup test env
+        """
+        self.assignment_dir = Path(__file__).parent.absolute().joinpath("resources", "python_addition")
+
+    def test_verify(self):
+        """
+        tests detecting modified locked cells
+        """
+        release_notebook = GraderNotebook(self.assignment_dir.joinpath("python_addition_release.ipynb"))
+        submission_file = self.assignment_dir.joinpath("python_addition_correct_submission.ipynb")
+        with open(submission_file) as fp:
+            notebook = json.load(fp)
+        for cell in notebook["cells"]:
+            if cell["metadata"].get("nbgrader", {}).get("locked"):
+                cell["source"] = ["assert True"]
+        for verifier in [ChecksumVerifier(), ChecksumVerifier(release_notebook=release_notebook)]:
+            with self.subTest(release=bool(verifier.expected_checksums)):
+                self.assertEqual([], verifier.verify(Submission(submission_file)))
+                tampered_submission = Submission(notebook)
+                tampered = verifier.verify(tampered_submission)
+                self.assertEqual(["cell-744e5dbe470759ae"], [cell.grade_id for cell in tampered])
+                self.assertEqual("32907e78e874ccf89bff7231b26055cd", tampered[0].expected)
+
+    def test_verify_all(self):
+        """
+        tests verifying a batch of unmodified submissions
+        """
+        submissions = Submissions.from_zip(self.assignment_dir.joinpath("submissions.zip"))
+        verifier = ChecksumVerifier()
+        self.assertEqual({}, verifier.verify_all(submissions.submissions))
+        self.assertEqual(2, verifier.checked_cells)
+
+
+if __name__ == '__main__':
+    unittest.main()
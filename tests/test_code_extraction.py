@@ -2,8 +2,10 @@ import logging
 import os
 import tempfile
 import unittest
+import zipfile
 from pathlib import Path
 import nbgExtract
+from nbgExtract.gen.writer import GeneratedFileWriter
 from nbgExtract.notebook import GraderNotebook, Submission, Submissions
 from nbgExtract import logger
 
@@ -129,6 +131,29 @@ class TestSubmissions(unittest.TestCase):
             for expected_file in expected_files:
                 self.assertTrue(Path(tmpdirname).joinpath(expected_file).is_file())
 
+    def test_generate_python_files_to_zip(self):
+        """
+        tests writing the generated python files into a single zip file
+        """
+        source_file = f"{self.resource_dir}/python_addition/python_addition_source.ipynb"
+        zip_file = f"{self.resource_dir}/python_addition/submissions.zip"
+        submissions = Submissions.from_zip(zip_file)
+        submissions.source_notebook = GraderNotebook(source_file, name="addition")
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            output_zip = Path(tmpdirname).joinpath("generated.zip")
+            writer = GeneratedFileWriter(tmpdirname, max_queue_size=1, zip_path=output_zip)
+            submissions.generate_python_files(tmpdirname, writer=writer)
+            self.assertEqual(2, writer.written)
+            # writing after close appends to the zip file instead of truncating it
+            writer.write("late.py", "pass\n")
+            writer.close()
+            with zipfile.ZipFile(output_zip) as archive:
+                self.assertIn(
+                        'test_Group_1_122542_assignsubmission_file/python_addition_correct_submission.py',
+                        archive.namelist()
+                )
+                self.assertIn("late.py", archive.namelist())
+
 
 if __name__ == '__main__':
     unittest.main()
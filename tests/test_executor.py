@@ -0,0 +1,78 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from nbgExtract.executor import GradingWorker, InProcessExecutor, ProcessPoolGradingExecutor, SocketExecutor
+from nbgExtract.gen.generator import NbgCodeGenerator
+from nbgExtract.notebook import GraderNotebook, Submissions
+from nbgExtract.progress import ProgressTracker
+
+
+class TestGradingExecutor(unittest.TestCase):
+    """
+    test the execution backends
+    """
+
+    def setUp(self) -> None:
+        """
+        setup test env
+        """
+        assignment_dir = Path(__file__).parent.absolute().joinpath("resources", "python_addition")
+        submissions = Submissions.from_zip(assignment_dir.joinpath("submissions.zip"))
+        source_notebook = GraderNotebook(str(assignment_dir.joinpath("python_addition_source.ipynb")))
+        self.merged_notebooks = [submission.merge_code(source_notebook) for submission in submissions.submissions]
+
+    def test_executors(self):
+        """
+        tests that all backends grade merged notebooks and generated files with the same results
+        """
+        expected = InProcessExecutor().run(self.merged_notebooks)
+        self.assertEqual(len(self.merged_notebooks), len(expected))
+        self.assertEqual([1.0, 0.0], sorted([results[0].points for results in expected], reverse=True))
+        with tempfile.TemporaryDirectory() as target:
+            generator = NbgCodeGenerator()
+            file_paths = []
+            for notebook in self.merged_notebooks:
+                generator.generate_file(notebook, Path(target))
+                file_paths.append(Path(target).joinpath(generator.get_file_name(notebook)))
+            self.assertEqual(expected, InProcessExecutor().run(file_paths))
+            self.assertEqual([], list(Path(target).glob("**/results.json")))
+        with ProcessPoolGradingExecutor(max_workers=2) as executor:
+            self.assertEqual(expected, executor.run(self.merged_notebooks))
+        with GradingWorker(executor=ProcessPoolGradingExecutor(max_workers=2)) as worker:
+            worker.start()
+            try:
+                with SocketExecutor([worker.address], slots=2, timeout=60) as executor:
+                    self.assertEqual(expected, executor.run(self.merged_notebooks))
+                    with self.assertRaises(Exception):
+                        executor.submit_task(("broken.py", "def (")).result()
+            finally:
+                worker.shutdown()
+
+    def test_isolation(self):
+        """
+        tests that crashing or hanging submissions fail without affecting the other items
+        """
+        expected = InProcessExecutor().run(self.merged_notebooks)
+        with tempfile.TemporaryDirectory() as target:
+            crashing_file = Path(target).joinpath("test_crash.py")
+            crashing_file.write_text("import os\nos._exit(1)\n")
+            hanging_file = Path(target).joinpath("test_hang.py")
+            hanging_file.write_text("while True:\n    pass\n")
+            leaking_file = Path(target).joinpath("test_leak.py")
+            leaking_file.write_text("import builtins\nbuiltins.len = None\n")
+            with ProcessPoolGradingExecutor(max_workers=2, timeout=3) as executor:
+                with self.assertRaises(ChildProcessError):
+                    executor.submit(crashing_file).result()
+                with self.assertRaises(TimeoutError):
+                    executor.submit(hanging_file).result()
+                items = [crashing_file, self.merged_notebooks[0], hanging_file, leaking_file, *self.merged_notebooks]
+                progress = ProgressTracker(name="grading")
+                results = executor.run(items, progress=progress)
+        self.assertEqual([None, expected[0], None, None, *expected], results)
+        self.assertEqual((len(items), len(items), 3), (progress.total, progress.done, progress.failed))
+        self.assertIn(str(hanging_file), [item_name for item_name, _ in progress.slowest()])
+
+
+if __name__ == '__main__':
+    unittest.main()
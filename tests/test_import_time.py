@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+from typing import Dict
+
+
+def import_times(statement: str) -> Dict[str, int]:
+    """
+    run the given import statement in a fresh interpreter with -X importtime
+    Args:
+        statement: python code to run e.g. "import nbgExtract"
+
+    Returns:
+        dict: module name → cumulative import time in µs
+    """
+    env = dict(os.environ)
+    project_dir = str(Path(__file__).parent.parent.absolute())
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [project_dir, env.get("PYTHONPATH")]))
+    completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", statement],
+            capture_output=True, text=True, env=env, check=True
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[module.strip()] = int(cumulative)
+    return times
+
+
+class TestImportTime(unittest.TestCase):
+    """
+    startup regression benchmark based on python -X importtime
+    """
+
+    def test_notebook_context(self):
+        """
+        generated test files only import the NotebookContext - it must not pull in the package
+        """
+        times = import_times("import nbgExtract.gen.context")
+        print(f"nbgExtract.gen.context: {times['nbgExtract.gen.context']} µs")
+        for module in ["logging", "json", "typing", "dataclasses", "nbgExtract.cells", "nbgExtract.notebook",
+                       "nbgExtract.gen.generator"]:
+            with self.subTest(module=module):
+                self.assertNotIn(module, times)
+
+    def test_package(self):
+        """
+        importing the package and the cli has no side effects and loads the grading modules lazily
+        """
+        statement = "import logging, nbgExtract.nbgCode_cmd; assert not logging.getLogger().handlers"
+        times = import_times(statement)
+        print(f"nbgExtract.nbgCode_cmd: {times['nbgExtract.nbgCode_cmd']} µs")
+        for module in ["nbgExtract.notebook", "nbgExtract.gen.generator", "concurrent.futures", "tarfile", "ast"]:
+            with self.subTest(module=module):
+                self.assertNotIn(module, times)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from nbgExtract.notebook import GraderNotebook, Submissions
+from nbgExtract.progress import ProgressTracker
+
+
+class TestProgressTracker(unittest.TestCase):
+    """
+    test ProgressTracker
+    """
+
+    def test_status(self):
+        """
+        tests throughput, ETA and slowest items
+        """
+        progress = ProgressTracker(total=4, name="test", slowest=2)
+        for i, duration in enumerate([0.3, 0.1, 0.2]):
+            with progress.stage("generate"):
+                pass
+            progress.item_done(f"item_{i}", duration)
+        status = progress.status()
+        self.assertEqual(3, status["done"])
+        self.assertEqual([("item_0", 0.3), ("item_2", 0.2)], progress.slowest())
+        self.assertIn("generate", status["stage_latencies"])
+        self.assertGreater(status["rate"], 0)
+        self.assertIsNotNone(status["eta"])
+        self.assertIn("(0003/0004)", progress.summary())
+
+    def test_status_file(self):
+        """
+        tests the status file of a generation run
+        """
+        resource_dir = Path(__file__).parent.absolute().joinpath("resources", "python_addition")
+        submissions = Submissions.from_zip(resource_dir.joinpath("submissions.zip"))
+        submissions.source_notebook = GraderNotebook(resource_dir.joinpath("python_addition_source.ipynb"))
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            status_file = Path(tmpdirname).joinpath("status.json")
+            progress = ProgressTracker(status_file=status_file)
+            submissions.generate_python_files(tmpdirname, progress=progress)
+            status = json.loads(status_file.read_text())
+            self.assertEqual(2, status["done"])
+            self.assertEqual(2, status["total"])
+            self.assertEqual(0, status["eta"])
+            self.assertEqual({"merge", "generate", "write"}, set(status["stage_latencies"].keys()))
+            self.assertEqual(2, len(status["slowest"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
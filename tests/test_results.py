@@ -0,0 +1,64 @@
+import csv
+import json
+import math
+import tempfile
+import unittest
+from pathlib import Path
+
+from nbgExtract.results import ResultTable
+
+
+class TestResultTable(unittest.TestCase):
+    """
+    test ResultTable
+    """
+
+    def test_aggregate(self):
+        """
+        tests aggregating result shards with differing grade_ids
+        """
+        shards = [
+            [
+                {"notebook": "a", "total": 3, "test_1": 1.0, "test_2": 2.0},
+                {"notebook": "b", "total": 0, "test_1": 0.0, "test_2": None},
+            ],
+            [
+                {"notebook": "c", "total": 3, "test_1": 1.0, "test_3": 2.0},
+            ]
+        ]
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            for i, records in enumerate(shards):
+                shard = Path(tmpdirname).joinpath(f"shard_{i}", "results.json")
+                shard.parent.mkdir()
+                shard.write_text("".join(json.dumps(record) + "\n" for record in records))
+            table = ResultTable.from_shards([f"{tmpdirname}/**/results.json"])
+            self.assertEqual(["a", "b", "c"], table.notebooks)
+            self.assertEqual(["test_1", "test_2", "test_3"], table.grade_ids)
+            totals, pass_rates = table.statistics()
+            self.assertEqual([3.0, 0.0, 3.0], list(totals))
+            self.assertEqual({"test_1": 2 / 3, "test_2": 1.0, "test_3": 1.0}, pass_rates)
+            self.assertEqual([1, 0, 2], [count for _, _, count in table.histogram(bins=3)])
+            csv_path = Path(tmpdirname).joinpath("gradebook.csv")
+            table.to_csv(csv_path)
+            with open(csv_path) as fp:
+                rows = list(csv.reader(fp))
+            self.assertEqual(["notebook", "total", "test_1", "test_2", "test_3"], rows[0])
+            self.assertEqual(["b", "0.0", "0.0", "", ""], rows[2])
+
+    def test_regrade(self):
+        """
+        tests that the latest record of a regraded notebook replaces the earlier one
+        """
+        table = ResultTable()
+        table.add_record({"notebook": "a", "total": 0, "test_1": 0.0, "test_2": 1.0})
+        table.add_record({"notebook": "b", "total": 1, "test_1": 1.0})
+        table.add_record({"notebook": "a", "total": 1, "test_1": 1.0})
+        self.assertEqual(["a", "b"], table.notebooks)
+        totals, pass_rates = table.statistics()
+        self.assertEqual([1.0, 1.0], list(totals))
+        self.assertEqual(1.0, pass_rates["test_1"])
+        self.assertTrue(math.isnan(pass_rates["test_2"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
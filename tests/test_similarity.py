@@ -0,0 +1,98 @@
+import ast
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from nbgExtract.gen.generator import _preprocess_cell
+from nbgExtract.notebook import GraderNotebook, Submission, Submissions
+from nbgExtract.similarity import SimilarityIndex
+
+
+class TestSimilarityIndex(unittest.TestCase):
+    """
+    test SimilarityIndex
+    """
+
+    def test_candidate_pairs(self):
+        """
+        tests that renamed copies are found and unrelated answers are not
+        """
+        original = """
+def mean(values):
+    total = 0
+    for value in values:
+        total += value
+    return total / len(values)
+result = mean([1, 2, 3])
+"""
+        renamed_copy = """
+def average(numbers):
+    # copied
+    s = 0
+    for n in numbers:
+        s += n
+    return s / len(numbers)
+res = average([4, 5, 6])
+"""
+        unrelated = """
+import statistics
+words = "a b c".split()
+counts = {word: words.count(word) for word in words}
+print(sorted(counts.items(), key=lambda item: item[1]))
+"""
+        index = SimilarityIndex()
+        for key, sourcecode in [("original", original), ("copy", renamed_copy), ("unrelated", unrelated)]:
+            index.add(key, [sourcecode])
+        pairs = index.candidate_pairs()
+        self.assertEqual([("copy", "original")], [(pair.first, pair.second) for pair in pairs])
+        self.assertEqual(1.0, pairs[0].similarity)
+
+    def test_submissions(self):
+        """
+        tests collecting the answers while generating the python files
+        """
+        resource_dir = Path(__file__).parent.absolute().joinpath("resources", "python_addition")
+        submissions = Submissions.from_zip(resource_dir.joinpath("submissions.zip"))
+        submissions.source_notebook = GraderNotebook(resource_dir.joinpath("python_addition_source.ipynb"))
+        index = SimilarityIndex(min_shingles=1)
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            submissions.generate_python_files(tmpdirname, similarity_index=index)
+        # the unanswered release notebook of group 2 is identical to the template
+        self.assertEqual(1, len(index))
+        self.assertEqual([], index.candidate_pairs())
+
+    def test_templates(self):
+        """
+        tests that untouched scaffold answers are not reported as near-duplicates
+        """
+        resource_dir = Path(__file__).parent.absolute().joinpath("resources", "python_addition")
+        release = GraderNotebook(resource_dir.joinpath("python_addition_release.ipynb"))
+        source = GraderNotebook(resource_dir.joinpath("python_addition_source.ipynb"))
+        for template in [release, source]:
+            with self.subTest(template=template.name), tempfile.TemporaryDirectory() as tmpdirname:
+                index = SimilarityIndex(min_shingles=1, template_notebook=template)
+                for i in range(2):
+                    untouched = Path(tmpdirname).joinpath(f"untouched_{i}.ipynb")
+                    untouched.write_bytes(resource_dir.joinpath("python_addition_release.ipynb").read_bytes())
+                    self.assertIsNone(index.add_submission(Submission(str(untouched))))
+                self.assertEqual(0, len(index))
+                self.assertEqual([], index.candidate_pairs())
+
+    def test_single_parse(self):
+        """
+        tests that the index reuses the cell preprocessing of the generator instead of parsing the answers again
+        """
+        resource_dir = Path(__file__).parent.absolute().joinpath("resources", "python_addition")
+        submissions = Submissions.from_zip(resource_dir.joinpath("submissions.zip"))
+        submissions.source_notebook = GraderNotebook(resource_dir.joinpath("python_addition_source.ipynb"))
+        _preprocess_cell.cache_clear()
+        with mock.patch("ast.parse", wraps=ast.parse) as parse, tempfile.TemporaryDirectory() as tmpdirname:
+            submissions.generate_python_files(tmpdirname, similarity_index=SimilarityIndex(min_shingles=1))
+        parsed_sources = [call.args[0] for call in parse.call_args_list]
+        self.assertTrue(parsed_sources)
+        self.assertEqual(len(set(parsed_sources)), len(parsed_sources))
+
+
+if __name__ == '__main__':
+    unittest.main()
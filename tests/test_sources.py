@@ -0,0 +1,75 @@
+import io
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+from nbgExtract.notebook import Submissions
+from nbgExtract.sources import SubmissionSource, TarSource, group_of
+
+
+class TestSubmissionSource(unittest.TestCase):
+    """
+    test SubmissionSource
+    """
+
+    def setUp(self) -> None:
+        """
+        setup test env
+        """
+        self.assignment_dir = Path(__file__).parent.absolute().joinpath("resources", "python_addition")
+        self.zip_file = self.assignment_dir.joinpath("submissions.zip")
+
+    def test_sources(self):
+        """
+        tests reading submissions from directories, tar files and nested zip files
+        """
+        expected_groups = ["Group 1_122542_assignsubmission_file", "Group 2_122543_assignsubmission_file"]
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            tmpdir = Path(tmpdirname)
+            # plain directory tree
+            directory = tmpdir.joinpath("directory")
+            with zipfile.ZipFile(self.zip_file) as archive:
+                archive.extractall(directory)
+            # tar.gz bundle
+            tar_path = tmpdir.joinpath("submissions.tar.gz")
+            with tarfile.open(tar_path, mode="w:gz") as archive:
+                archive.add(directory, arcname=".")
+            # course zip with per student zips
+            nested_zip_path = tmpdir.joinpath("course.zip")
+            with zipfile.ZipFile(nested_zip_path, mode="w") as course_archive:
+                for group in expected_groups:
+                    student_zip = io.BytesIO()
+                    with zipfile.ZipFile(student_zip, mode="w") as student_archive:
+                        for notebook_path in directory.joinpath(group).iterdir():
+                            student_archive.write(notebook_path, arcname=notebook_path.name)
+                    course_archive.writestr(f"{group}.zip", student_zip.getvalue())
+            for location in [directory, tar_path, nested_zip_path, self.zip_file]:
+                with self.subTest(location=location.name):
+                    source = SubmissionSource.for_path(location)
+                    if location is tar_path:
+                        self.assertIsInstance(source, TarSource)
+                    submissions = Submissions.from_source(source)
+                    self.assertEqual(2, len(submissions))
+                    self.assertEqual(expected_groups, sorted(submissions.groups().keys()))
+                    selected = Submissions.from_source(location, only=["Group_2"])
+                    self.assertEqual(expected_groups[1:], list(selected.groups().keys()))
+
+    def test_group_of(self):
+        """
+        tests the per student grouping of member names
+        """
+        test_params = [
+            ("Group 1_122542_assignsubmission_file", "Group 1_122542_assignsubmission_file/a.ipynb"),
+            ("Group 1_122542_assignsubmission_file", "course/Group 1_122542_assignsubmission_file/a.ipynb"),
+            ("student", "student/a.ipynb"),
+            ("", "a.ipynb"),
+        ]
+        for expected, name in test_params:
+            with self.subTest(name=name):
+                self.assertEqual(expected, group_of(name))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from nbgExtract.notebook import GraderNotebook
+from nbgExtract.watch import SubmissionWatcher
+
+
+class TestSubmissionWatcher(unittest.TestCase):
+    """
+    test SubmissionWatcher
+    """
+
+    def setUp(self) -> None:
+        """
+        setup test env
+        """
+        self.assignment_dir = Path(__file__).parent.absolute().joinpath("resources", "python_addition")
+
+    def test_scan(self):
+        """
+        tests that only new or changed submissions are generated
+        """
+        source_notebook = GraderNotebook(self.assignment_dir.joinpath("python_addition_source.ipynb"))
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            drop_dir = Path(tmpdirname).joinpath("drop")
+            drop_dir.mkdir()
+            watcher = SubmissionWatcher(drop_dir, source_notebook, Path(tmpdirname).joinpath("output"))
+            self.assertEqual([], watcher.scan())
+            shutil.copy(self.assignment_dir.joinpath("submissions.zip"), drop_dir)
+            self.assertEqual(2, len(watcher.scan()))
+            self.assertEqual([], watcher.scan())
+            submission = drop_dir.joinpath("late_submission.ipynb")
+            shutil.copy(self.assignment_dir.joinpath("python_addition_correct_submission.ipynb"), submission)
+            generated = watcher.scan()
+            self.assertEqual(["test_late_submission.py"], [file_path.name for file_path in generated])
+            # touching the file without changing the content does not regenerate it
+            submission.write_bytes(submission.read_bytes() + b"\n")
+            submission.write_bytes(submission.read_bytes()[:-1])
+            self.assertEqual([], watcher.scan())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import shutil
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+from nbgExtract.notebook import Submissions
+from nbgExtract.zipindex import ZipIndex, matches_group
+
+
+class TestZipIndex(unittest.TestCase):
+    """
+    test ZipIndex
+    """
+
+    def setUp(self) -> None:
+        """
+        setup test env
+        """
+        self.zip_file = Path(__file__).parent.absolute().joinpath("resources", "python_addition", "submissions.zip")
+
+    def test_selective_read(self):
+        """
+        tests reading single submissions via the persistent index
+        """
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            zip_path = Path(tmpdirname).joinpath("submissions.zip")
+            shutil.copy(self.zip_file, zip_path)
+            index = ZipIndex.load(zip_path)
+            self.assertTrue(index.index_path.is_file())
+            self.assertEqual(2, len(ZipIndex.load(zip_path).entries))
+            with zipfile.ZipFile(zip_path) as archive:
+                for entry in index.entries:
+                    with self.subTest(entry=entry.name):
+                        self.assertEqual(archive.read(entry.name), index.read(entry))
+            submissions = Submissions.from_zip(zip_path, only=["Group_2"])
+            self.assertEqual(1, len(submissions))
+            self.assertIn("Group 2_122543", str(submissions.submissions[0].notebook_filepath))
+
+    def test_matches_group(self):
+        """
+        tests matching group selectors
+        """
+        group = "Group 17_122558_assignsubmission_file"
+        self.assertTrue(matches_group(group, "Group_17"))
+        self.assertTrue(matches_group(group, group))
+        self.assertFalse(matches_group(group, "Group_1"))
+
+
+if __name__ == '__main__':
+    unittest.main()